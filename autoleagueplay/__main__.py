@@ -2,8 +2,10 @@
 
 Usage:
     autoleagueplay setup <working_dir>
-    autoleagueplay run (odd | even | rolling) [--teamsize=T] [--replays=R] [--ignore-missing] [--autoshutdown=S] [--stale-rematch-threshold=X] [--half-robin]
-    autoleagueplay bubble [--teamsize=T] [--replays=R]
+    autoleagueplay run (odd | even | rolling) [--teamsize=T] [--replays=R] [--archive-replays] [--ignore-missing] [--autoshutdown=S] [--stale-rematch-threshold=X] [--half-robin] [--max-dwell=S]
+    autoleagueplay coordinator (odd | even | rolling) [--teamsize=T] [--ignore-missing] [--stale-rematch-threshold=X] [--half-robin] [--host=H] [--port=P] [--token=K] [--lease-timeout=S] [--max-dwell=S]
+    autoleagueplay worker <coordinator_address> [--replays=R] [--archive-replays] [--max-dwell=S] [--token=K]
+    autoleagueplay bubble [--teamsize=T] [--replays=R] [--archive-replays] [--max-dwell=S] [--place-new] [--coordinate] [--host=H] [--port=P] [--token=K] [--lease-timeout=S]
     autoleagueplay list (odd | even | rolling) [--stale-rematch-threshold=X] [--half-robin]
     autoleagueplay results (odd | even | rolling)
     autoleagueplay check
@@ -13,11 +15,14 @@ Usage:
     autoleagueplay leaderboard (clip | symbols | legend)
     autoleagueplay results-to-version-files <results_file>
     autoleagueplay unzip
+    autoleagueplay benchmark [--bots=N] [--workers=W] [--seed=X] [--keep]
+    autoleagueplay benchmark startup [--repeat=N]
     autoleagueplay (-h | --help)
     autoleagueplay --version
 
 Options:
     --replays=R                  What to do with the replays of the match. Valid values are 'ignore', 'save', and 'calculated_gg'. [default: calculated_gg]
+    --archive-replays            Move the replays from the game's replay folder into the working directory's replay archive.
     --teamsize=T                 How many players per team. [default: 1]
     --ignore-missing             Allow the script to run even though not all bots are in the bot directory.
     --autoshutdown=S              Shutdown the system S seconds after autoleague ends, usefull for VMs. [default: 0]
@@ -26,26 +31,41 @@ Options:
     --stale-rematch-threshold=X  Skip matches when a bot has beaten another X times in a row, and neither of them have updated their code.
     --half-robin                 The divisions will be cut in half (with overlap) when setting up round-robins, for fewer matches.
     --top-only                   Only display top 40 bots on the leaderboard even though there might be more bots.
+    --host=H                     The address the coordinator listens on. Use 0.0.0.0 to accept workers from other machines. [default: 127.0.0.1]
+    --port=P                     The port the coordinator listens on for workers. [default: 8642]
+    --token=K                    A shared secret. The coordinator refuses requests from workers that don't have the same token.
+    --lease-timeout=S            Seconds without hearing from a worker before its match is given to another worker. [default: 180]
+    --max-dwell=S                The longest pause in seconds for showing results on the overlay. Use 0 for headless runs.
+    --place-new                  Only place new bots on the ladder, by binary search, instead of bubble sorting the ladder.
+    --coordinate                 Sort with an odd-even transposition sort, where workers on other machines play the matches of each pass at once.
+    --bots=N                     Number of generated bots in the benchmark. [default: 200]
+    --workers=W                  Number of simulated matches played at the same time in the benchmark. [default: 1]
+    --seed=X                     Seed of the simulated matches in the benchmark. [default: 0]
+    --keep                       Keep the benchmark's temporary working directory instead of deleting it.
+    --repeat=N                   How many times each command is started in the startup benchmark. [default: 5]
 """
 import sys
 from pathlib import Path
 
 from docopt import docopt
 
-from autoleagueplay.bubble_sort import run_bubble_sort
 from autoleagueplay.ladder import RunStrategy
-from autoleagueplay.leaderboard.leaderboard import generate_leaderboard, generate_leaderboard_clip
-from autoleagueplay.leaderboard.symbols import generate_symbols, generate_legend
-from autoleagueplay.list_matches import list_matches, list_results, parse_results_and_write_files
-from autoleagueplay.load_bots import check_bot_folder, unzip_all_bots, DEFAULT_TIMESTAMP
 from autoleagueplay.paths import WorkingDir
-from autoleagueplay.replays import ReplayPreference
-from autoleagueplay.run_matches import run_league_play
 from autoleagueplay.settings import PersistentSettings
-from autoleagueplay.sheets import fetch_ladder_from_sheets
-from autoleagueplay.test_bots import test_all_bots
 from autoleagueplay.version import __version__
 
+# The modules needed by each command are imported when the command is chosen. Some commands need heavy libraries,
+# like PIL and moviepy for the leaderboard, or rlbot's game interface for playing matches, and the other commands
+# shouldn't have to wait for those to load.
+
+
+def start_replay_services(working_dir: WorkingDir, replay_preference, archive_replays: bool):
+    # The uploader is started by the commands themselves, see prepare_replay_uploads
+    from autoleagueplay.replays import ReplayPreference
+    if archive_replays and replay_preference != ReplayPreference.IGNORE_REPLAY:
+        from autoleagueplay.replay_archive import start_replay_archive
+        start_replay_archive(working_dir.replay_archive)
+
 
 def main():
     arguments = docopt(__doc__, version=__version__)
@@ -59,6 +79,16 @@ def main():
         settings.save()
         print(f'Working directory successfully set to \'{working_dir}\'')
 
+    elif arguments['benchmark']:
+        from autoleagueplay.benchmark import run_benchmark, run_startup_benchmark
+
+        if arguments['startup']:
+            run_startup_benchmark(int(arguments['--repeat']))
+        else:
+            # The benchmark uses its own temporary working directory
+            run_benchmark(int(arguments['--bots']), RunStrategy.ROLLING, int(arguments['--workers']),
+                          int(arguments['--seed']), arguments['--keep'])
+
     else:
         # Following commands require a working dir. Make sure it is set.
         if settings.working_dir_raw is None:
@@ -83,53 +113,105 @@ def main():
         if arguments['--half-robin']:
             half_robin = True
 
+        max_dwell = None
+        if arguments['--max-dwell']:
+            max_dwell = float(arguments['--max-dwell'])
+
         if arguments['leaderboard']:
             if run_strategy is not None:
+                from autoleagueplay.leaderboard.leaderboard import generate_leaderboard
                 generate_leaderboard(working_dir, run_strategy, not arguments['--top-only'])
             elif arguments['clip']:
+                from autoleagueplay.leaderboard.leaderboard import generate_leaderboard_clip
                 generate_leaderboard_clip(working_dir)
             elif arguments['symbols']:
+                from autoleagueplay.leaderboard.symbols import generate_symbols
                 generate_symbols()
             elif arguments['legend']:
+                from autoleagueplay.leaderboard.symbols import generate_legend
                 generate_legend(working_dir)
             else:
                 raise NotImplementedError()
 
         elif arguments['run']:
+            from autoleagueplay.load_bots import check_bot_folder
+            from autoleagueplay.pacing import Pacer
+            from autoleagueplay.replays import ReplayPreference
+            from autoleagueplay.run_matches import run_league_play
 
             replay_preference = ReplayPreference(arguments['--replays'])
             team_size = int(arguments['--teamsize'])
             shutdown_time = int(arguments['--autoshutdown'])
+            start_replay_services(working_dir, replay_preference, arguments['--archive-replays'])
+
+            pacer = Pacer.for_working_dir(working_dir, max_dwell)
 
             if not arguments['--ignore-missing']:
                 all_present = check_bot_folder(working_dir, run_strategy)
                 if all_present:
                     run_league_play(working_dir, run_strategy, replay_preference, team_size, shutdown_time,
-                                    stale_rematch_threshold, half_robin)
+                                    stale_rematch_threshold, half_robin, pacer=pacer)
             else:
                 run_league_play(working_dir, run_strategy, replay_preference, team_size, shutdown_time,
-                                stale_rematch_threshold, half_robin)
+                                stale_rematch_threshold, half_robin, pacer=pacer)
+
+        elif arguments['coordinator']:
+            from autoleagueplay.coordinator import run_coordinator
+            from autoleagueplay.load_bots import check_bot_folder
+
+            team_size = int(arguments['--teamsize'])
+            port = int(arguments['--port'])
+            lease_timeout = float(arguments['--lease-timeout'])
+
+            if arguments['--ignore-missing'] or check_bot_folder(working_dir, run_strategy):
+                run_coordinator(working_dir, run_strategy, team_size, stale_rematch_threshold, half_robin,
+                                host=arguments['--host'], port=port, lease_timeout=lease_timeout, max_dwell=max_dwell,
+                                token=arguments['--token'])
+
+        elif arguments['worker']:
+            from autoleagueplay.coordinator import run_worker
+            from autoleagueplay.replays import ReplayPreference
+
+            replay_preference = ReplayPreference(arguments['--replays'])
+            start_replay_services(working_dir, replay_preference, arguments['--archive-replays'])
+            run_worker(working_dir, arguments['<coordinator_address>'], replay_preference, max_dwell,
+                       arguments['--token'])
 
         elif arguments['bubble']:
+            from autoleagueplay.bubble_sort import run_bubble_sort
+            from autoleagueplay.replays import ReplayPreference
 
             replay_preference = ReplayPreference(arguments['--replays'])
             team_size = int(arguments['--teamsize'])
+            start_replay_services(working_dir, replay_preference, arguments['--archive-replays'])
+
+            pool = None
+            if arguments['--coordinate']:
+                from autoleagueplay.coordinator import RemoteMatchPool
+                pool = RemoteMatchPool(arguments['--host'], int(arguments['--port']),
+                                       float(arguments['--lease-timeout']), arguments['--token'])
 
-            run_bubble_sort(working_dir, team_size, replay_preference)
+            run_bubble_sort(working_dir, team_size, replay_preference, max_dwell, arguments['--place-new'], pool)
 
         elif arguments['list']:
+            from autoleagueplay.list_matches import list_matches
             list_matches(working_dir, run_strategy, stale_rematch_threshold, half_robin)
 
         elif arguments['results']:
+            from autoleagueplay.list_matches import list_results
             list_results(working_dir, run_strategy, half_robin)
 
         elif arguments['check']:
+            from autoleagueplay.load_bots import check_bot_folder
             check_bot_folder(working_dir)
 
         elif arguments['test']:
+            from autoleagueplay.test_bots import test_all_bots
             test_all_bots(working_dir)
 
         elif arguments['fetch']:
+            from autoleagueplay.sheets import fetch_ladder_from_sheets
+
             season = int(arguments['<season_num>'])
             week_num = int(arguments['<week_num>'])
 
@@ -141,10 +223,14 @@ def main():
                 print(bot)
 
         elif arguments['results-to-version-files']:
+            from autoleagueplay.list_matches import parse_results_and_write_files
+            from autoleagueplay.load_bots import DEFAULT_TIMESTAMP
+
             results_file = arguments['<results_file>']
             parse_results_and_write_files(working_dir, working_dir._working_dir / results_file, DEFAULT_TIMESTAMP)
 
         elif arguments['unzip']:
+            from autoleagueplay.load_bots import unzip_all_bots
             unzip_all_bots(working_dir)
 
         else:
@@ -0,0 +1,124 @@
+"""
+Measures the overhead of autoleagueplay itself by running a whole league play event with simulated matches.
+The event runs in a temporary working directory with generated bots, so it doesn't touch the real working directory.
+Also measures how long each command takes to start, i.e. to import what it needs.
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from autoleagueplay.ladder import Ladder, RunStrategy
+from autoleagueplay.match_pool import WorkerPool
+from autoleagueplay.pacing import Pacer
+from autoleagueplay.paths import PackageFiles, WorkingDir
+from autoleagueplay.replays import ReplayPreference
+from autoleagueplay.run_matches import GameInstanceWorker, run_league_play
+from autoleagueplay.simulation import SimulatedBackend, SimulationModel
+from autoleagueplay.timing import MATCH_PHASE, timer
+
+# The module each command imports when it is chosen, see __main__
+COMMAND_MODULES = [
+    ('setup', None),
+    ('run', 'autoleagueplay.run_matches'),
+    ('coordinator', 'autoleagueplay.coordinator'),
+    ('worker', 'autoleagueplay.coordinator'),
+    ('bubble', 'autoleagueplay.bubble_sort'),
+    ('list', 'autoleagueplay.list_matches'),
+    ('results', 'autoleagueplay.list_matches'),
+    ('check', 'autoleagueplay.load_bots'),
+    ('test', 'autoleagueplay.test_bots'),
+    ('fetch', 'autoleagueplay.sheets'),
+    ('leaderboard', 'autoleagueplay.leaderboard.leaderboard'),
+    ('leaderboard symbols', 'autoleagueplay.leaderboard.symbols'),
+    ('results-to-version-files', 'autoleagueplay.list_matches'),
+    ('unzip', 'autoleagueplay.load_bots'),
+    ('benchmark', 'autoleagueplay.benchmark'),
+]
+
+BOT_CONFIG_TEMPLATE = '''[Locations]
+looks_config = ./appearance.cfg
+python_file = ./bot.py
+name = {name}
+
+[Details]
+developer = Benchmark
+description = A generated bot for benchmarking
+language = python
+'''
+
+
+def create_benchmark_bots(working_dir: WorkingDir, num_bots: int):
+    """
+    Creates a bot folder for each bot and a ladder with all of them.
+    """
+    names = [f'Bench Bot {i:03}' for i in range(num_bots)]
+    for name in names:
+        folder = working_dir.bots / name
+        folder.mkdir()
+        (folder / 'bot.cfg').write_text(BOT_CONFIG_TEMPLATE.format(name=name))
+        (folder / 'bot.py').write_text('')
+        shutil.copy(PackageFiles.psyonix_appearance, folder / 'appearance.cfg')
+    Ladder(names).write(working_dir.ladder)
+
+
+def run_benchmark(num_bots: int, run_strategy: RunStrategy = RunStrategy.ROLLING, workers: int = 1, seed: int = 0,
+                  keep: bool = False):
+    """
+    Runs a league play event with simulated matches and prints how much time was spent in each phase.
+    :param workers: Number of simulated workers playing matches concurrently.
+    :param keep: If true, the temporary working directory isn't deleted afterwards, so the results can be inspected.
+    """
+    temp_dir = Path(tempfile.mkdtemp(prefix='autoleagueplay_benchmark_'))
+    try:
+        working_dir = WorkingDir(temp_dir)
+        create_benchmark_bots(working_dir, num_bots)
+
+        model = SimulationModel(seed=seed)
+        pacer = Pacer.headless()
+        pool = WorkerPool([GameInstanceWorker(ReplayPreference.IGNORE_REPLAY, pacer, SimulatedBackend(model, seed + i))
+                           for i in range(workers)])
+
+        # League play prints the time spent in each phase when it's done
+        start = time.perf_counter()
+        run_league_play(working_dir, run_strategy, ReplayPreference.IGNORE_REPLAY, 1, 0, pool=pool, pacer=pacer)
+        total = time.perf_counter() - start
+
+        print()
+        print(f'Played {timer.counts[MATCH_PHASE]} simulated matches between {num_bots} bots in {total:.2f} seconds')
+    finally:
+        if keep:
+            print(f'Kept the working directory at {temp_dir}')
+        else:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run_startup_benchmark(repeat: int = 5):
+    """
+    Prints how long each command takes to start, i.e. to import the modules the command needs.
+    Each command is started in a fresh interpreter the given number of times, and the fastest time is reported.
+    """
+    python_startup = _time_python('pass', repeat)
+    print(f'Starting Python takes {python_startup:.3f} seconds. It is not included below.')
+    print(f'{"Command":<26} {"Seconds":>8}')
+    for command, module in COMMAND_MODULES:
+        code = 'import autoleagueplay.__main__'
+        if module is not None:
+            code += f'; import {module}'
+        try:
+            seconds = _time_python(code, repeat) - python_startup
+            print(f'{command:<26} {seconds:>8.3f}')
+        except subprocess.CalledProcessError as e:
+            error = e.stderr.decode('utf-8', errors='replace').strip().splitlines()
+            print(f'{command:<26} {"failed":>8}  {error[-1] if len(error) > 0 else ""}')
+
+
+def _time_python(code: str, repeat: int) -> float:
+    fastest = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        fastest = min(fastest, time.perf_counter() - start)
+    return fastest
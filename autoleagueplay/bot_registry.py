@@ -0,0 +1,348 @@
+"""
+A persistent cache of the bots in the bot folder. Scanning for bot configs, parsing them, and finding the date a bot
+was last updated is slow with hundreds of bots, so the results are stored on disk and only recomputed for bot folders
+that have changed since last time.
+"""
+import hashlib
+import json
+import os
+import subprocess
+from datetime import datetime
+from os.path import relpath
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+# rlbot's config parsing imports much of rlbot, so it is only imported when a config actually has to be parsed.
+# The BotConfigBundle annotations below are strings for the same reason.
+if TYPE_CHECKING:
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
+
+REGISTRY_VERSION = 1
+
+
+class LazyBotConfig:
+    """
+    Stands in for a BotConfigBundle using only the cached information. The config file is parsed the first time any
+    other attribute of the bundle is needed.
+    """
+
+    def __init__(self, name: str, config_path: str, logo_file: Optional[str], supports_early_start: bool):
+        self.name = name
+        self.config_path = config_path
+        self.logo_file = logo_file
+        self.supports_early_start = supports_early_start
+        self._bundle = None
+
+    def get_logo_file(self) -> Optional[str]:
+        return self.logo_file
+
+    def get_bundle(self) -> 'BotConfigBundle':
+        if self._bundle is None:
+            from rlbot.parsing.bot_config_bundle import get_bot_config_bundle
+            self._bundle = get_bot_config_bundle(self.config_path)
+        return self._bundle
+
+    def __getattr__(self, item):
+        # Only called for attributes we don't have ourselves
+        if item.startswith('__') or item == '_bundle':
+            raise AttributeError(item)
+        return getattr(self.get_bundle(), item)
+
+    def to_json(self):
+        return {
+            'name': self.name,
+            'config_path': self.config_path,
+            'logo_file': self.logo_file,
+            'supports_early_start': self.supports_early_start,
+        }
+
+    @staticmethod
+    def from_bundle(bundle: 'BotConfigBundle') -> 'LazyBotConfig':
+        bot = LazyBotConfig(bundle.name, bundle.config_path, bundle.get_logo_file(), bool(bundle.supports_early_start))
+        bot._bundle = bundle
+        return bot
+
+    @staticmethod
+    def from_json(data) -> 'LazyBotConfig':
+        return LazyBotConfig(data['name'], data['config_path'], data['logo_file'], data['supports_early_start'])
+
+
+class RegistryEntry:
+    """
+    The cached information about one folder in the bot directory.
+    """
+
+    def __init__(self, fingerprint: str, updated_date: datetime, bots: List[LazyBotConfig]):
+        self.fingerprint = fingerprint
+        self.updated_date = updated_date
+        self.bots = bots
+
+    def to_json(self):
+        return {
+            'fingerprint': self.fingerprint,
+            'updated_date': self.updated_date.isoformat(),
+            'bots': [bot.to_json() for bot in self.bots],
+        }
+
+    @staticmethod
+    def from_json(data) -> 'RegistryEntry':
+        return RegistryEntry(data['fingerprint'], datetime.fromisoformat(data['updated_date']),
+                             [LazyBotConfig.from_json(bot) for bot in data['bots']])
+
+
+class BotRegistry:
+    """
+    Keeps track of the bots in each bot folder. A folder is only rescanned when its fingerprint has changed.
+    For folders git tracks, the fingerprint is made from the folder's git tree hash at HEAD, which catches committed
+    changes, the most recent modification time of the folder and its subdirectories, which catches files being added
+    or removed, and the modification times and sizes of the files git reports as changed or untracked.
+    For folders git doesn't track, the fingerprint is only the most recent modification time of the folder and its
+    subdirectories, so a warm load never has to look at every file. Files that are overwritten in place without
+    touching their directory are not noticed, so whatever does that must call forget, like `autoleagueplay unzip`.
+    """
+
+    def __init__(self, cache_path: Path, root: Path, bots_dir: Path):
+        self.cache_path = cache_path
+        self.root = root
+        self.bots_dir = bots_dir
+
+    def load(self) -> Dict[str, RegistryEntry]:
+        """
+        Returns a dictionary from bot folder name to registry entry, rescanning the folders that have changed.
+        """
+        cached = self._read_cache()
+        bot_folders = [p for p in self.bots_dir.iterdir() if p.is_dir()]
+        tree_hashes = get_git_tree_hashes(self.root, self.bots_dir)
+        dirty_files = get_git_dirty_files(self.root, self.bots_dir) if len(tree_hashes) > 0 else None
+
+        entries = {}
+        changed_folders = []
+        for folder in bot_folders:
+            if folder.name in tree_hashes and dirty_files is not None:
+                dirty_signature = get_files_signature(folder, dirty_files.get(folder.name, []))
+                fingerprint = f'git:{tree_hashes[folder.name]} mtime:{get_directory_mtime(folder)} ' \
+                              f'dirty:{dirty_signature}'
+            else:
+                fingerprint = f'mtime:{get_directory_mtime(folder)}'
+            entry = cached.get(folder.name)
+            if entry is not None and entry.fingerprint == fingerprint:
+                entries[folder.name] = entry
+            else:
+                changed_folders.append((folder, fingerprint))
+
+        uncached = set()  # Folders whose entries are used now, but are not trustworthy enough to be cached
+        if len(changed_folders) > 0:
+            from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
+            tracked_folders = [folder for folder, _ in changed_folders if folder.name in tree_hashes]
+            git_dates = get_git_dates(self.root, self.bots_dir, tracked_folders) if len(tracked_folders) > 0 else {}
+            for folder, fingerprint in changed_folders:
+                date = git_dates.get(folder.name) if git_dates is not None else None
+                if date is None:
+                    if folder.name in tree_hashes:
+                        # Git tracks the folder, but its history couldn't be read. The modified date will do for
+                        # now, and the folder is looked at again next time.
+                        uncached.add(folder.name)
+                    date = get_modified_date(folder)
+                bots = [LazyBotConfig.from_bundle(bundle) for bundle in scan_directory_for_bot_configs(folder)]
+                entries[folder.name] = RegistryEntry(fingerprint, date, bots)
+
+        if len(changed_folders) > 0 or len(entries) != len(cached):
+            self._write_cache({name: entry for name, entry in entries.items() if name not in uncached})
+
+        return entries
+
+    def forget(self, paths: List[Path]):
+        """
+        Removes the bot folders containing the given paths from the cache, so they are rescanned by the next load.
+        """
+        cached = self._read_cache()
+        bots_dir = self.bots_dir.resolve()
+        forgotten = set()
+        for path in paths:
+            try:
+                relative = Path(path).resolve().relative_to(bots_dir)
+            except ValueError:
+                continue
+            # A path that is the bot directory itself contains every folder
+            forgotten.update(relative.parts[:1] if len(relative.parts) > 0 else cached.keys())
+        if len(forgotten & cached.keys()) > 0:
+            self._write_cache({name: entry for name, entry in cached.items() if name not in forgotten})
+
+    def _read_cache(self) -> Dict[str, RegistryEntry]:
+        if not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != REGISTRY_VERSION or data.get('root') != str(self.root):
+                # The cached config paths are absolute, so they are useless if the working dir has moved
+                return {}
+            return {name: RegistryEntry.from_json(entry) for name, entry in data['folders'].items()}
+        except Exception as e:
+            print(f'Ignoring unreadable bot registry {self.cache_path.name}: {e}')
+            return {}
+
+    def _write_cache(self, entries: Dict[str, RegistryEntry]):
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': REGISTRY_VERSION,
+                'root': str(self.root),
+                'folders': {name: entry.to_json() for name, entry in entries.items()},
+            }, f, indent=4)
+        os.replace(tmp_path, self.cache_path)
+
+
+def get_git_tree_hashes(root: Path, bots_dir: Path) -> Dict[str, str]:
+    """
+    Returns a dictionary from bot folder name to the hash of its git tree at HEAD. Folders that git doesn't track are
+    missing from the dictionary.
+    """
+    prefix = Path(relpath(bots_dir, root)).as_posix() + '/'
+    try:
+        output = subprocess.check_output(['git', 'ls-tree', '-z', 'HEAD', prefix], cwd=root,
+                                         stderr=subprocess.DEVNULL)
+    except Exception:
+        return {}
+
+    hashes = {}
+    for line in output.split(b'\0'):
+        if len(line) == 0:
+            continue
+        # Each line looks like: <mode> SP <type> SP <hash> TAB <path>
+        info, _, path = line.decode('utf-8', errors='replace').partition('\t')
+        mode, object_type, object_hash = info.split(' ')
+        if object_type == 'tree' and path.startswith(prefix):
+            hashes[path[len(prefix):]] = object_hash
+    return hashes
+
+
+def get_directory_mtime(folder: Path) -> int:
+    """
+    Returns the most recent modification time of the folder and all its subdirectories. Adding, removing or
+    renaming a file changes the modification time of its directory, so this is a cheap way to notice changes without
+    looking at every file.
+    """
+    ignored_directories = ['__pycache__', '.git']
+    max_mtime = os.stat(folder).st_mtime_ns
+    for root, dirs, files in os.walk(folder, topdown=True):
+        dirs[:] = [d for d in dirs if d not in ignored_directories]
+        for d in dirs:
+            max_mtime = max(max_mtime, os.stat(os.path.join(root, d)).st_mtime_ns)
+    return max_mtime
+
+
+def get_git_dirty_files(root: Path, bots_dir: Path) -> Optional[Dict[str, List[Path]]]:
+    """
+    Returns a dictionary from bot folder name to the files in it that are modified or untracked according to
+    `git status`, relative to the bot folder. Returns None if git status can't be read.
+    """
+    prefix = Path(relpath(bots_dir, root)).as_posix() + '/'
+    try:
+        toplevel = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=root,
+                                           stderr=subprocess.DEVNULL).decode('utf-8').strip()
+        output = subprocess.check_output(['git', 'status', '--porcelain', '-z', '--untracked-files=all', '--', prefix],
+                                         cwd=root, stderr=subprocess.DEVNULL)
+    except Exception:
+        return None
+
+    bots_dir = bots_dir.resolve()
+    dirty = {}
+    tokens = output.split(b'\0')
+    i = 0
+    while i < len(tokens):
+        token = tokens[i].decode('utf-8', errors='replace')
+        i += 1
+        if len(token) < 4:
+            continue
+        # Each entry looks like: XY SP <path relative to the repository root>. Renames and copies are followed by
+        # the original path as a separate entry.
+        status, path = token[:2], token[3:]
+        if 'R' in status or 'C' in status:
+            i += 1
+        try:
+            relative = (Path(toplevel) / path).resolve().relative_to(bots_dir)
+        except ValueError:
+            continue
+        if len(relative.parts) > 1:
+            dirty.setdefault(relative.parts[0], []).append(Path(*relative.parts[1:]))
+    return dirty
+
+
+def get_files_signature(folder: Path, files: List[Path]) -> str:
+    """
+    Returns a hash of the paths, modification times and sizes of the given files in the folder. Missing files are
+    included as missing.
+    """
+    signature = hashlib.sha1()
+    for file in sorted(files):
+        try:
+            stat = os.stat(folder / file)
+            signature.update(f'{file.as_posix()}:{stat.st_mtime_ns}:{stat.st_size}\n'.encode('utf-8'))
+        except OSError:
+            signature.update(f'{file.as_posix()}:missing\n'.encode('utf-8'))
+    return signature.hexdigest()
+
+
+def get_git_dates(root: Path, bots_dir: Path, bot_folders: List[Path]) -> Optional[Dict[str, datetime]]:
+    """
+    Finds the date of the last commit touching each bot folder using a single walk over the git history, instead of
+    one `git log` per folder. The walk stops as soon as every folder has been seen.
+    Returns a dictionary from folder name to date. Folders that git doesn't track are missing from the dictionary.
+    Returns None if the history couldn't be read completely, since a partial walk would miss some folders' dates.
+    """
+    wanted = set(folder.name for folder in bot_folders)
+    prefix = Path(relpath(bots_dir, root)).as_posix() + '/'
+    dates = {}
+
+    def handle_token(token: bytes):
+        nonlocal date
+        token = token.lstrip(b'\n')
+        if token.startswith(b'\x01'):
+            date = datetime.fromisoformat(token[1:].decode('utf-8'))
+        elif token.startswith(prefix.encode('utf-8')) and date is not None:
+            folder_name = token.decode('utf-8', errors='replace')[len(prefix):].split('/')[0]
+            if folder_name in wanted and folder_name not in dates:
+                dates[folder_name] = date
+
+    # Each commit is printed as \x01<date> followed by the paths it changed. Everything is separated by \0.
+    command = ['git', 'log', '-z', '--name-only', '--format=%x01%ad', '--date=iso-strict', '--relative',
+               '--', prefix]
+    date = None
+    pending = b''
+    try:
+        with subprocess.Popen(command, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+            for chunk in iter(lambda: process.stdout.read1(1 << 16), b''):
+                tokens = (pending + chunk).split(b'\0')
+                pending = tokens.pop()
+                for token in tokens:
+                    handle_token(token)
+                if len(dates) == len(wanted):
+                    process.kill()
+                    break
+            else:
+                handle_token(pending)
+                if process.wait() != 0:
+                    raise Exception(f'git log exited with code {process.returncode}')
+    except Exception as e:
+        print(f'Could not read bot versions from git, using modified dates for now: {e}')
+        return None
+
+    return dates
+
+
+def get_modified_date(folder) -> datetime:
+    ignored_directories = ['__pycache__', '.git']
+    ignored_files = ['RLBot_Core_Interface.dll']
+    ignored_types = ['.cfg']
+    max_timestamp = 0
+    for root, dirs, files in os.walk(folder, topdown=True):
+        dirs[:] = [d for d in dirs if d not in ignored_directories]
+        times = [os.stat(os.path.join(root, f)).st_mtime for f in files
+                 if f not in ignored_files and Path(f).suffix not in ignored_types]
+        if len(times) > 0:
+            timestamp = max(times)
+            if timestamp > max_timestamp:
+                max_timestamp = timestamp
+
+    return datetime.fromtimestamp(max_timestamp)
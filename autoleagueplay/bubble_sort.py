@@ -1,18 +1,20 @@
 import os
 import subprocess
-import time
 from dataclasses import dataclass
 from datetime import datetime
 from time import sleep
+from typing import List, Optional, Tuple
 
 from autoleagueplay.bubble_sort_overlay import BubbleSortOverlayData
-from autoleagueplay.ladder import Ladder
 from autoleagueplay.load_bots import load_all_bots_versioned
 from autoleagueplay.match_configurations import make_match_config
+from autoleagueplay.match_pool import MatchJob, MatchPool
 from autoleagueplay.match_result import MatchResult
+from autoleagueplay.pacing import Pacer
 from autoleagueplay.paths import WorkingDir
-from autoleagueplay.replays import ReplayPreference
+from autoleagueplay.replays import ReplayPreference, prepare_replay_uploads
 from autoleagueplay.run_matches import run_match
+from autoleagueplay.sort_journal import SortJournal
 
 
 @dataclass
@@ -24,13 +26,22 @@ class SortStepOutcome:
 class BubbleSorter:
 
     def __init__(self, working_dir: WorkingDir, team_size: int,
-                 replay_preference: ReplayPreference):
-        self.ladder = Ladder.read(working_dir.ladder)
+                 replay_preference: ReplayPreference, pacer: Pacer = None, place_new: bool = False):
+        """
+        :param place_new: If true, new bots are placed on the ladder by binary search and nothing else is sorted.
+        Otherwise new bots start at the bottom and the whole ladder is bubble sorted.
+        """
+        # Swaps are journaled, and ladder.txt is only rewritten at checkpoints
+        self.journal = SortJournal(working_dir.sort_journal, working_dir.ladder)
+        self.ladder = self.journal.recover()
         self.working_dir = working_dir
         self.team_size = team_size
         self.replay_preference = replay_preference
+        self.pacer = pacer or Pacer.for_working_dir(working_dir)
+        self.place_new = place_new
         self.bundle_map = {}
         self.versioned_bots_by_name = {}
+        self.incoming_bots = []
         self.num_already_played_during_iteration = 0
 
     def try_gather_versioned_bots(self):
@@ -46,6 +57,8 @@ class BubbleSorter:
         git_root = self.working_dir._working_dir
 
         subprocess.call(['git', 'pull'], cwd=git_root)
+        # The pull may have brought results from other machines
+        self.working_dir.result_store.sync()
 
         self.versioned_bots_by_name = load_all_bots_versioned(self.working_dir)
 
@@ -55,19 +68,41 @@ class BubbleSorter:
         }
 
         bots_available = set([vb.get_unversioned_key() for vb in self.versioned_bots_by_name.values()])
-        incoming_bots = bots_available.difference(set(self.ladder.bots))
-        self.ladder.bots.extend(incoming_bots)
+        self.incoming_bots = sorted(bots_available.difference(set(self.ladder.bots)))
+        old_bots = self.ladder.bots
         self.ladder.bots = [bot for bot in self.ladder.bots if bot in bots_available]
+        if not self.place_new:
+            # The incoming bots start at the bottom. When placing them instead, they are not written to the ladder
+            # until they have been placed, so an interrupted placement starts over for the bots not yet placed.
+            self.ladder.bots = self.ladder.bots + self.incoming_bots
 
-        self.ladder.write(self.working_dir.ladder)
+        if self.ladder.bots != old_bots:
+            self.journal.checkpoint(self.ladder)
 
     def begin(self):
         self.gather_versioned_bots()
-        num_bots = len(self.ladder.bots)
+        num_bots = len(self.ladder.bots) + (len(self.incoming_bots) if self.place_new else 0)
         if num_bots < 2:
             raise Exception(f'Need at least 2 bots to run a bubble sort! Found {num_bots}')
         self.num_already_played_during_iteration = 0
 
+        try:
+            if self.place_new:
+                for bot in self.incoming_bots:
+                    self.place(bot)
+            else:
+                self.sort()
+        finally:
+            # Also write the ladder if the sort is interrupted, so nothing has to be recovered from the journal
+            self.journal.checkpoint(self.ladder)
+            self.journal.close()
+
+        overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, 0, False,
+                                             self.working_dir._working_dir, winner=self.ladder.bots[0],
+                                             sort_complete=True)
+        overlay_data.write(self.working_dir.overlay_interface)
+
+    def sort(self):
         next_index = 0
         while True:
             step_outcome = self.advance(next_index)
@@ -75,20 +110,45 @@ class BubbleSorter:
                 break
             next_index = step_outcome.upper_index
 
-        overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, 0, False,
-                                             self.working_dir._working_dir, winner=self.ladder.bots[0],
-                                             sort_complete=True)
-        overlay_data.write(self.working_dir.overlay_interface)
+    def place(self, bot: str):
+        """
+        Places an incoming bot on the ladder by binary search. The bot plays the bot in the middle of the ranks where
+        it could still belong, and depending on who wins, the upper or lower half of those ranks is ruled out.
+        This takes about log2(n) matches, where bubbling up from the bottom takes up to n matches.
+        """
+        placed_bots = self.ladder.bots
+        upper_rank = 0
+        lower_rank = len(placed_bots)
+        while upper_rank < lower_rank:
+            middle = (upper_rank + lower_rank) // 2
+            opponent = placed_bots[middle]
+
+            # Show the incoming bot right below its opponent on the overlay
+            overlay_ladder = placed_bots[:middle + 1] + [bot] + placed_bots[middle + 1:]
+            past_result = self.get_past_result(opponent, bot)
+            if past_result is not None:
+                self.show_past_result(middle, overlay_ladder)
+                winner = past_result.winner
+            else:
+                winner = self.play_match(bot, opponent, middle, overlay_ladder).winner
+                self.pacer.dwell(12)
+
+            if winner == bot:
+                lower_rank = middle
+            else:
+                upper_rank = middle + 1
+
+        self.ladder.bots = placed_bots[:upper_rank] + [bot] + placed_bots[upper_rank:]
+        self.journal.checkpoint(self.ladder)
+        print(f'Placed {bot} at rank {upper_rank + 1}')
 
     def get_past_result(self, bot_1, bot_2) -> MatchResult:
-        path = self.get_result_path(bot_1, bot_2)
-        if path.exists():
-            try:
-                print(f'Found existing result {path.name}')
-                return MatchResult.read(path)
-            except Exception as e:
-                print(f'Error loading result {path.name}. Fix/delete the result and run script again.')
-                raise e
+        versioned_bot_1 = self.versioned_bots_by_name[bot_1]
+        versioned_bot_2 = self.versioned_bots_by_name[bot_2]
+        head_to_head = self.working_dir.get_head_to_head(versioned_bot_1.get_key(), versioned_bot_2.get_key())
+        if head_to_head is not None:
+            print(f'Found existing result between {versioned_bot_1} and {versioned_bot_2}')
+            return head_to_head.latest_result
         return None
 
     def get_result_path(self, bot_1, bot_2):
@@ -101,15 +161,13 @@ class BubbleSorter:
         winner = result.winner
         loser = result.loser
 
-        winner_index = self.ladder.bots.index(winner)
-        loser_index = self.ladder.bots.index(loser)
+        winner_index = self.ladder.rank(winner)
+        loser_index = self.ladder.rank(loser)
 
         if winner_index > loser_index:
             # Need to swap the indices!
-            self.ladder.bots[loser_index] = winner
-            self.ladder.bots[winner_index] = loser
-
-        self.ladder.write(self.working_dir.ladder)
+            self.ladder.swap(winner, loser)
+            self.journal.record_swap(self.ladder, winner, loser)
 
     def advance(self, upper_index) -> SortStepOutcome:
 
@@ -133,28 +191,108 @@ class BubbleSorter:
 
         if past_result is not None:
             self.num_already_played_during_iteration += 1
-            overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, upper_index, False,
-                                                 self.working_dir._working_dir)
-            overlay_data.write(self.working_dir.overlay_interface)
+            self.show_past_result(upper_index)
             self._on_match_complete(past_result)
-            sleep(1)
             return SortStepOutcome(upper_index=upper_index, sort_complete=False)
         else:
-            overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, upper_index, True,
-                                                 self.working_dir._working_dir)
-            overlay_data.write(self.working_dir.overlay_interface)
+            match_result = self.play_match(next_below, next_above, upper_index)
+            self._on_match_complete(match_result)
+            self.pacer.dwell(12)
+            return SortStepOutcome(upper_index=upper_index, sort_complete=False)
 
-            match_config = make_match_config(self.bundle_map[next_below], self.bundle_map[next_above], self.team_size)
-            match_result = run_match(next_below, next_above, match_config, self.replay_preference)
+    def show_past_result(self, sort_index: int, overlay_ladder: List[str] = None):
+        overlay_ladder = overlay_ladder or self.ladder.bots
+        overlay_data = BubbleSortOverlayData(overlay_ladder, self.versioned_bots_by_name, sort_index, False,
+                                             self.working_dir._working_dir)
+        overlay_data.write(self.working_dir.overlay_interface)
+        self.pacer.dwell(1)
+
+    def play_match(self, bot_below: str, bot_above: str, sort_index: int,
+                   overlay_ladder: List[str] = None) -> MatchResult:
+        """
+        Plays a match between the two bots and stores the result. The bots are at sort_index and the rank below it.
+        :param overlay_ladder: The ladder shown on the overlay, if it isn't the ladder being sorted.
+        """
+        overlay_ladder = overlay_ladder or self.ladder.bots
+        overlay_data = BubbleSortOverlayData(overlay_ladder, self.versioned_bots_by_name, sort_index, True,
+                                             self.working_dir._working_dir)
+        overlay_data.write(self.working_dir.overlay_interface)
 
-            match_result.write(self.get_result_path(next_below, next_above))
-            overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, upper_index, True,
-                                                 self.working_dir._working_dir, winner=match_result.winner)
-            overlay_data.write(self.working_dir.overlay_interface)
+        match_config = make_match_config(self.bundle_map[bot_below], self.bundle_map[bot_above], self.team_size)
+        match_result = run_match(bot_below, bot_above, match_config, self.replay_preference)
 
-            self._on_match_complete(match_result)
-            sleep(12)
-            return SortStepOutcome(upper_index=upper_index, sort_complete=False)
+        self.working_dir.write_version_specific_match_result(match_result, self.get_result_path(bot_below, bot_above))
+        overlay_data = BubbleSortOverlayData(overlay_ladder, self.versioned_bots_by_name, sort_index, True,
+                                             self.working_dir._working_dir, winner=match_result.winner)
+        overlay_data.write(self.working_dir.overlay_interface)
+        return match_result
+
+
+class TranspositionSorter(BubbleSorter):
+    """
+    Sorts the ladder with an odd-even transposition sort instead of a bubble sort. Each pass compares every other
+    adjacent pair on the ladder, alternating between the pairs starting at even and at odd ranks. The pairs of a pass
+    share no bots, so the pool plays all their matches at the same time. The ladder and the overlay are updated once
+    per pass instead of once per match.
+    The pool's workers must each have their own game, e.g. remote workers of a coordinator on separate machines.
+    Several game sessions in one process would all control the same Rocket League instance.
+    """
+
+    def __init__(self, working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference,
+                 pool: MatchPool, pacer: Pacer = None, place_new: bool = False):
+        super().__init__(working_dir, team_size, replay_preference, pacer, place_new)
+        self.pool = pool
+
+    def sort(self):
+        # The ladder is sorted when an even and an odd pass in a row swap nothing. Like the bubble sort, we also stop
+        # when two passes in a row only found past results, since more passes would just repeat them.
+        parity = 0
+        passes_without_swaps = 0
+        passes_without_matches = 0
+        while passes_without_swaps < 2 and passes_without_matches < 2:
+            swaps, matches_played = self.run_pass(parity)
+            passes_without_swaps = passes_without_swaps + 1 if swaps == 0 else 0
+            passes_without_matches = passes_without_matches + 1 if matches_played == 0 else 0
+            parity = 1 - parity
+
+    def run_pass(self, parity: int) -> Tuple[int, int]:
+        """
+        Compares the adjacent pairs whose upper bot has a rank with the given parity. Pairs without a past result
+        play a match. Returns the number of swaps and the number of matches played.
+        """
+        pairs = [(upper_index, self.ladder.bots[upper_index], self.ladder.bots[upper_index + 1])
+                 for upper_index in range(parity, len(self.ladder.bots) - 1, 2)]
+
+        winners = {}
+        jobs = []
+        for upper_index, bot_above, bot_below in pairs:
+            past_result = self.get_past_result(bot_above, bot_below)
+            if past_result is not None:
+                winners[upper_index] = past_result.winner
+            else:
+                jobs.append(MatchJob(upper_index // self.ladder.division_size, self.versioned_bots_by_name[bot_below],
+                                     self.versioned_bots_by_name[bot_above], self.team_size, sort_index=upper_index))
+
+        sort_indices = [upper_index for upper_index, _, _ in pairs]
+        overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name,
+                                             sort_indices[0] if len(sort_indices) > 0 else 0, len(jobs) > 0,
+                                             self.working_dir._working_dir, sort_indices=sort_indices)
+        overlay_data.write(self.working_dir.overlay_interface)
+
+        for job, result in self.pool.run(jobs):
+            self.working_dir.write_version_specific_match_result(
+                result, self.working_dir.get_version_specific_match_result(job.blue, job.orange))
+            winners[job.sort_index] = result.winner
+
+        swaps = 0
+        for upper_index, bot_above, bot_below in pairs:
+            if winners[upper_index] == bot_below:
+                self.ladder.swap(bot_above, bot_below)
+                self.journal.record_swap(self.ladder, bot_above, bot_below)
+                swaps += 1
+
+        self.pacer.dwell(12 if len(jobs) > 0 else 1)
+        return swaps, len(jobs)
 
 
 def get_modified_date(folder) -> datetime:
@@ -170,8 +308,21 @@ def get_modified_date(folder) -> datetime:
     return datetime.fromtimestamp(max_timestamp)
 
 
-def run_bubble_sort(working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference):
-    sorter = BubbleSorter(working_dir, team_size, replay_preference)
-    sorter.begin()
-    print('Bubble sort is complete!')
-    time.sleep(10)  # Leave some time to display the overlay.
+def run_bubble_sort(working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference,
+                    max_dwell: float = None, place_new: bool = False, pool: Optional[MatchPool] = None):
+    """
+    :param pool: If given, an odd-even transposition sort is used, which plays the matches of each pass at the same
+    time with the pool, e.g. a RemoteMatchPool whose workers are other machines. The pool is closed afterwards.
+    Otherwise the matches are played one at a time in this machine's game.
+    """
+    prepare_replay_uploads(working_dir, replay_preference)
+    pacer = Pacer.for_working_dir(working_dir, max_dwell)
+    if pool is not None:
+        with pool:
+            sorter = TranspositionSorter(working_dir, team_size, replay_preference, pool, pacer, place_new)
+            sorter.begin()
+    else:
+        sorter = BubbleSorter(working_dir, team_size, replay_preference, pacer, place_new)
+        sorter.begin()
+    print('New bots have been placed!' if place_new else 'Bubble sort is complete!')
+    pacer.dwell(10)  # Leave some time to display the overlay.
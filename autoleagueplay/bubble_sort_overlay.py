@@ -6,7 +6,11 @@ from typing import List
 
 class BubbleSortOverlayData:
     def __init__(self, ladder: List[str], versioned_map, sort_index: int, needs_match: bool, root_dir, winner: str=None,
-                 sort_complete: bool=False):
+                 sort_complete: bool=False, sort_indices: List[int]=None):
+        """
+        :param sort_index: The rank of the upper bot of the pair being compared.
+        :param sort_indices: The upper ranks of all pairs being compared at the same time, if there are several.
+        """
         self.ladder = ladder
         self.bot_map = {}
 
@@ -22,6 +26,7 @@ class BubbleSortOverlayData:
             }
 
         self.sort_index = sort_index
+        self.sort_indices = sort_indices if sort_indices is not None else [sort_index]
         self.needs_match = needs_match
         self.winner = winner
         self.sort_complete = sort_complete
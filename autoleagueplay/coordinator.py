@@ -0,0 +1,346 @@
+"""
+Lets several machines play the matches of one league play event. The coordinator owns the ladder, the working
+directory and the queue of matches, and serves matches over HTTP. Workers lease a match, play it in their own
+Rocket League instance, and report the result back. A lease expires if the worker stops renewing it, e.g. because the
+machine crashed, and the match is then handed to another worker.
+
+Protocol (all requests are POSTs with a json body and a json response):
+    /lease     {worker}                  -> {lease_id, job} or {} if no match is available or {done: true}
+    /renew     {lease_id}                -> {ok}  ok is false if the lease has expired
+    /complete  {lease_id, result}        -> {ok}
+    /release   {lease_id, reason, failed, unplayable} -> {ok}  gives the match back, e.g. if the worker can't play it
+If the coordinator has a token, every request must carry it in the X-Coordinator-Token header.
+"""
+import hmac
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Set
+
+import requests
+
+from autoleagueplay.ladder import RunStrategy
+from autoleagueplay.load_bots import load_all_bots_versioned
+from autoleagueplay.match_pool import MatchEvent, MatchJob, MatchPool
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.pacing import Pacer
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replays import ReplayPreference, prepare_replay_uploads
+from autoleagueplay.run_matches import GameInstanceWorker, run_league_play
+
+DEFAULT_HOST = '127.0.0.1'  # Only this machine. Use e.g. 0.0.0.0 to let workers on other machines connect.
+DEFAULT_PORT = 8642
+DEFAULT_LEASE_TIMEOUT = 180  # seconds. Workers renew their lease every LEASE_RENEW_INTERVAL seconds while playing
+LEASE_RENEW_INTERVAL = 30
+LEASE_POLL_INTERVAL = 5  # seconds between a worker's requests when no match is available
+DEFAULT_MAX_FAILURES = 3  # A match that fails this many times is reported as an error instead of being retried
+# A match that workers give back this many times because they don't have the right bot versions is reported as an error
+DEFAULT_MAX_UNPLAYABLE = 10
+TOKEN_HEADER = 'X-Coordinator-Token'
+
+
+class Lease:
+    def __init__(self, lease_id: str, job_id: int, worker: str, expires_at: float):
+        self.lease_id = lease_id
+        self.job_id = job_id
+        self.worker = worker
+        self.expires_at = expires_at
+        self.active = True
+
+
+class RemoteMatchPool(MatchPool):
+    """
+    A match pool whose workers are other machines. Submitted matches wait in a queue until a worker leases them.
+    A match that workers fail to play max_failures times is finished with an error, like in a WorkerPool. So is a match
+    that workers gave back max_unplayable times because none of them had the right versions of the bots.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+                 token: Optional[str] = None, max_failures: int = DEFAULT_MAX_FAILURES,
+                 max_unplayable: int = DEFAULT_MAX_UNPLAYABLE):
+        """
+        :param token: If given, requests without this token are refused. Recommended when binding to other hosts
+        than localhost, since anyone who can reach the coordinator could otherwise submit results.
+        """
+        super().__init__()
+        self.lease_timeout = lease_timeout
+        self.token = token
+        self.max_failures = max_failures
+        self.max_unplayable = max_unplayable
+        self._failures: Dict[int, int] = {}  # Number of failed attempts of each job
+        self._refusals: Dict[int, Set[str]] = {}  # Workers that gave back each job because they couldn't play it
+        self._unplayable: Dict[int, int] = {}  # Number of times each job was given back by such workers
+        self._lock = threading.Lock()
+        self._next_job_id = 0
+        self._jobs: Dict[int, MatchJob] = {}  # Submitted and not yet completed
+        self._queue = []  # Ids of jobs that are waiting for a worker, oldest first
+        self._leases: Dict[str, Lease] = {}
+        self._done = False
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name='coordinator', daemon=True)
+        self._server_thread.start()
+        print(f'Coordinator listening on {host}:{self._server.server_address[1]}')
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _dispatch(self, job: MatchJob):
+        with self._lock:
+            job_id = self._next_job_id
+            self._next_job_id += 1
+            self._jobs[job_id] = job
+            self._queue.append(job_id)
+
+    def close(self):
+        # Tell workers that ask for more matches to stop, then give idle workers a chance to hear it
+        with self._lock:
+            self._done = True
+        time.sleep(LEASE_POLL_INTERVAL + 1)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def lease(self, worker: str) -> Dict[str, Any]:
+        with self._lock:
+            if self._done:
+                return {'done': True}
+            self._expire_leases()
+            if len(self._queue) == 0:
+                return {}
+            # Prefer matches the worker hasn't given back before, so workers that can play them get the chance
+            job_id = next((job_id for job_id in self._queue if worker not in self._refusals.get(job_id, ())),
+                          self._queue[0])
+            self._queue.remove(job_id)
+            job = self._jobs[job_id]
+            lease = Lease(uuid.uuid4().hex, job_id, worker, time.time() + self.lease_timeout)
+            self._leases[lease.lease_id] = lease
+        print(f'{worker} leased {job}')
+        self.events.put(MatchEvent(job, started=True))
+        return {'lease_id': lease.lease_id, 'job': job_to_json(job)}
+
+    def renew(self, lease_id: str) -> bool:
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            if lease is None or not lease.active:
+                return False
+            lease.expires_at = time.time() + self.lease_timeout
+            return True
+
+    def complete(self, lease_id: str, result: MatchResult) -> bool:
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            # A result is accepted even if the lease expired, as long as no one else has finished the match yet
+            if lease is None or lease.job_id not in self._jobs:
+                return False
+            job = self._jobs.pop(lease.job_id)
+            if lease.job_id in self._queue:
+                self._queue.remove(lease.job_id)
+            for other in [l for l in self._leases.values() if l.job_id == lease.job_id]:
+                del self._leases[other.lease_id]
+        print(f'{lease.worker} finished {job}')
+        self.events.put(MatchEvent(job, started=False, result=result))
+        return True
+
+    def release(self, lease_id: str, reason: str, failed: bool = False, unplayable: bool = False) -> bool:
+        """
+        Puts the leased match back in the queue. If failed is true, the worker tried to play the match and failed,
+        which counts towards the match's max_failures. If unplayable is true, the worker doesn't have the right
+        versions of the bots, which counts towards the match's max_unplayable.
+        """
+        with self._lock:
+            lease = self._leases.pop(lease_id, None)
+            if lease is None or not lease.active or lease.job_id not in self._jobs:
+                return False
+            job = self._jobs[lease.job_id]
+            failures = self._failures.get(lease.job_id, 0) + int(failed)
+            self._failures[lease.job_id] = failures
+            unplayable_count = self._unplayable.get(lease.job_id, 0) + int(unplayable)
+            self._unplayable[lease.job_id] = unplayable_count
+            if unplayable:
+                self._refusals.setdefault(lease.job_id, set()).add(lease.worker)
+            error = None
+            if failures >= self.max_failures:
+                error = Exception(f'{job} failed {failures} times. Last error from {lease.worker}: {reason}')
+            elif unplayable_count >= self.max_unplayable:
+                workers = ', '.join(sorted(self._refusals[lease.job_id]))
+                error = Exception(f'{job} was given back {unplayable_count} times because no worker had the right '
+                                  f'versions of the bots. Workers without them: {workers}')
+            if error is not None:
+                del self._jobs[lease.job_id]
+            else:
+                self._queue.append(lease.job_id)
+        print(f'{lease.worker} gave back {job}: {reason}')
+        if error is not None:
+            self.events.put(MatchEvent(job, started=False, error=error))
+        return True
+
+    def _expire_leases(self):
+        now = time.time()
+        for lease in [l for l in self._leases.values() if l.active and l.expires_at < now]:
+            # The lease is kept around, so a late result from the worker can still be accepted
+            lease.active = False
+            if lease.job_id in self._jobs and lease.job_id not in self._queue:
+                print(f'Lease of {self._jobs[lease.job_id]} by {lease.worker} expired. It will be reassigned.')
+                # Expired matches go first in line, since the rest of the event is waiting for them
+                self._queue.insert(0, lease.job_id)
+
+
+def _make_handler(pool: RemoteMatchPool):
+    class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if pool.token is not None and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ''), pool.token):
+                self.send_error(403)
+                return
+            if self.path == '/lease':
+                response = pool.lease(body['worker'])
+            elif self.path == '/renew':
+                response = {'ok': pool.renew(body['lease_id'])}
+            elif self.path == '/complete':
+                response = {'ok': pool.complete(body['lease_id'], MatchResult.from_json(body['result']))}
+            elif self.path == '/release':
+                response = {'ok': pool.release(body['lease_id'], body.get('reason', ''), body.get('failed', False),
+                                               body.get('unplayable', False))}
+            else:
+                self.send_error(404)
+                return
+            data = json.dumps(response).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Don't print every request
+
+    return CoordinatorRequestHandler
+
+
+def job_to_json(job: MatchJob) -> Dict[str, Any]:
+    return {
+        'div_index': job.div_index,
+        'blue': job.blue.bot_config.name,
+        'blue_key': job.blue.get_key(),
+        'orange': job.orange.bot_config.name,
+        'orange_key': job.orange.get_key(),
+        'team_size': job.team_size,
+    }
+
+
+def run_coordinator(working_dir: WorkingDir, run_strategy: RunStrategy, team_size: int,
+                    stale_rematch_threshold: int = 0, half_robin: bool = False, host: str = DEFAULT_HOST,
+                    port: int = DEFAULT_PORT, lease_timeout: float = DEFAULT_LEASE_TIMEOUT, max_dwell: float = None,
+                    token: Optional[str] = None):
+    """
+    Runs a league play event like run_league_play, except the matches are played by remote workers.
+    Results are stored in the coordinator's working directory only.
+    """
+    pool = RemoteMatchPool(host, port, lease_timeout, token)
+    pacer = Pacer.for_working_dir(working_dir, max_dwell)
+    run_league_play(working_dir, run_strategy, ReplayPreference.IGNORE_REPLAY, team_size, 0,
+                    stale_rematch_threshold, half_robin, pool=pool, pacer=pacer)
+
+
+class CoordinatorClient:
+    def __init__(self, address: str, token: Optional[str] = None):
+        if not address.startswith('http'):
+            address = f'http://{address}'
+        if ':' not in address.split('//', 1)[1]:
+            address = f'{address}:{DEFAULT_PORT}'
+        self.address = address
+        self.headers = {TOKEN_HEADER: token} if token is not None else {}
+
+    def post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        response = requests.post(f'{self.address}{path}', json=body, headers=self.headers, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+
+def run_worker(working_dir: WorkingDir, address: str, replay_preference: ReplayPreference, max_dwell: float = None,
+               token: Optional[str] = None):
+    """
+    Plays matches for a coordinator until it says the event is done. The worker's bot folder must contain the same
+    versions of the bots as the coordinator's. Matches between bots with other versions are given back.
+    """
+    prepare_replay_uploads(working_dir, replay_preference)
+    client = CoordinatorClient(address, token)
+    name = f'{socket.gethostname()}-{os.getpid()}'
+    worker = GameInstanceWorker(replay_preference, Pacer.for_working_dir(working_dir, max_dwell))
+    bots = load_all_bots_versioned(working_dir)
+    print(f'Worker {name} playing matches for {client.address}')
+
+    while True:
+        try:
+            response = client.post('/lease', {'worker': name})
+        except requests.RequestException as e:
+            print(f'Could not reach coordinator: {e}')
+            time.sleep(10)
+            continue
+
+        if response.get('done'):
+            print('Coordinator is done. Stopping.')
+            return
+        if 'lease_id' not in response:
+            time.sleep(LEASE_POLL_INTERVAL)
+            continue
+
+        lease_id = response['lease_id']
+        job = _resolve_job(response['job'], bots)
+        if job is None:
+            reason = f'{name} does not have the right versions of {response["job"]["blue"]} ' \
+                     f'and {response["job"]["orange"]}'
+            print(reason)
+            _try_post(client, '/release', {'lease_id': lease_id, 'reason': reason, 'unplayable': True})
+            time.sleep(LEASE_POLL_INTERVAL)
+            continue
+
+        stop_renewing = threading.Event()
+        renew_thread = threading.Thread(target=_keep_renewing, args=(client, lease_id, stop_renewing), daemon=True)
+        renew_thread.start()
+        try:
+            result = worker.play(job)
+        except Exception as e:
+            print(f'Failed to play {job}: {e}')
+            _try_post(client, '/release', {'lease_id': lease_id, 'reason': str(e), 'failed': True})
+            continue
+        finally:
+            stop_renewing.set()
+
+        response = _try_post(client, '/complete', {'lease_id': lease_id, 'result': result.to_json()})
+        if response is None:
+            print(f'Could not report the result of {job}: {result.blue_goals}-{result.orange_goals}')
+        elif not response['ok']:
+            print(f'Coordinator did not accept the result of {job}. Someone else probably finished it first.')
+        worker.rest()
+
+
+def _try_post(client: CoordinatorClient, path: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        return client.post(path, body)
+    except requests.RequestException as e:
+        print(f'Could not reach coordinator: {e}')
+        return None
+
+
+def _resolve_job(data: Dict[str, Any], bots) -> Optional[MatchJob]:
+    blue = bots.get(data['blue'])
+    orange = bots.get(data['orange'])
+    if blue is None or orange is None or blue.get_key() != data['blue_key'] or orange.get_key() != data['orange_key']:
+        return None
+    return MatchJob(data['div_index'], blue, orange, data['team_size'])
+
+
+def _keep_renewing(client: CoordinatorClient, lease_id: str, stop: threading.Event):
+    while not stop.wait(LEASE_RENEW_INTERVAL):
+        try:
+            if not client.post('/renew', {'lease_id': lease_id})['ok']:
+                print('Lost the lease on the current match. Its result may be ignored.')
+        except requests.RequestException as e:
+            print(f'Could not renew lease: {e}')
@@ -0,0 +1,97 @@
+"""
+Decides in which order the round robins of a league play event can be played. Round robins that share ladder slots
+depend on each other, because the later round robin plays with the bots the earlier one placed in the shared slots.
+Round robins that share no slots are independent and can be played at the same time.
+"""
+from dataclasses import dataclass, field
+from typing import List, Set, Tuple
+
+from autoleagueplay.ladder import Ladder, RunStrategy
+
+
+@dataclass
+class RoundRobinRange:
+    """
+    A round robin between the ladder slots from start_index to end_index (both inclusive).
+    """
+    index: int  # Position in the play order
+    div_index: int
+    start_index: int
+    end_index: int
+    dependencies: Set[int] = field(default_factory=set)  # Indexes of round robins that must be played first
+
+    def slots(self) -> range:
+        return range(self.start_index, self.end_index + 1)
+
+    def overlaps(self, other: 'RoundRobinRange') -> bool:
+        return self.start_index <= other.end_index and other.start_index <= self.end_index
+
+
+def get_round_robin_ranges(ladder, div_index, half_robin) -> List[Tuple[int, int]]:
+    """
+    Returns a list of tuples. Each tuple has the start index and the end index (inclusive) of some ladder slots
+    that should participate in a round robin. For example, it might return [(4, 2), (2, 0)], which means there
+    should be a round robin including slots 4, 3, 2, and another round robin including slots 2, 1, 0.
+    :param ladder: The ladder we're playing in.
+    :param div_index: The index of the division that is currently being played.
+    :param half_robin: True if we want to split this division into two round-robins so fewer matches need to be played.
+    """
+
+    if half_robin:
+        num_bots = ladder.division_size + ladder.overlap_size
+
+        # smaller indices = higher bots on the ladder
+        upper_range = (div_index * ladder.division_size, div_index * ladder.division_size + num_bots // 2)
+        lower_range = (div_index * ladder.division_size + num_bots // 2, (div_index + 1) * ladder.division_size)
+        sub_ranges = [lower_range, upper_range]
+    else:
+        sub_ranges = [(div_index * ladder.division_size, (div_index + 1) * ladder.division_size)]
+    return sub_ranges
+
+
+def build_round_robin_graph(ladder: Ladder, run_strategy: RunStrategy, half_robin: bool) -> List[RoundRobinRange]:
+    """
+    Returns all the round robins of the event in play order, i.e. the divisions in reverse order so quantum plays
+    last. A round robin depends on every earlier round robin it shares a ladder slot with.
+    """
+    last_slot = len(ladder.bots) - 1
+    ranges = []
+    for div_index in ladder.playing_division_indices(run_strategy)[::-1]:
+        for start_index, end_index in get_round_robin_ranges(ladder, div_index, half_robin):
+            ranges.append(RoundRobinRange(len(ranges), div_index, start_index, min(end_index, last_slot)))
+
+    for later in ranges:
+        for earlier in ranges[:later.index]:
+            if later.overlaps(earlier):
+                later.dependencies.add(earlier.index)
+
+    return ranges
+
+
+class DivisionScheduler:
+    """
+    Hands out round robins as soon as all the round robins they depend on are finished.
+    """
+
+    def __init__(self, ranges: List[RoundRobinRange]):
+        self.ranges = ranges
+        self._started: Set[int] = set()
+        self._finished: Set[int] = set()
+
+    def take_ready(self) -> List[RoundRobinRange]:
+        """
+        Returns the round robins that can be started now, in play order, and marks them as started.
+        """
+        ready = [rr for rr in self.ranges
+                 if rr.index not in self._started and rr.dependencies.issubset(self._finished)]
+        self._started.update(rr.index for rr in ready)
+        return ready
+
+    def finish(self, rr: RoundRobinRange):
+        self._finished.add(rr.index)
+
+    def is_division_done(self, div_index: int) -> bool:
+        return all(rr.index in self._finished for rr in self.ranges if rr.div_index == div_index)
+
+    def is_done(self) -> bool:
+        return len(self._finished) == len(self.ranges)
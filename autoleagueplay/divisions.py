@@ -0,0 +1,65 @@
+"""
+Names, file keys and colours of the divisions on the ladder. The first divisions have proper names and colours.
+Ladders with more divisions than that, e.g. open qualifier ladders, get numbered gray divisions after them.
+"""
+import re
+from typing import List, Optional, Tuple
+
+NAMED_DIVISIONS = ('Quantum', 'Overclocked', 'Processor', 'Circuit', 'Transistor', 'Abacus', 'Babbage', 'Colossus',
+                   'Dragon', 'ENIAC', 'Ferranti', 'Grundy', 'Hobbit', 'Imagination', 'Jupiter', 'Komputer', 'Lambda')
+
+# Division: ((light), (normal), (dark)) -> RGB values
+Palette = Tuple[Tuple[int, int, int], Tuple[int, int, int], Tuple[int, int, int]]
+GRAY: Palette = ((200, 200, 200), (98, 98, 98), (56, 56, 56))
+PALETTES = {
+    'Quantum': ((218, 139, 249), (168, 85, 200), (99, 32, 135)),
+    'Overclocked': ((246, 138, 156), (206, 69, 90), (150, 11, 11)),
+    'Processor': ((82, 220, 234), (55, 151, 194), (20, 98, 117)),
+    'Circuit': ((134, 247, 131), (59, 186, 57), (26, 104, 24)),
+    'Transistor': ((250, 242, 168), (218, 207, 55), (158, 150, 27)),
+    'Abacus': ((183, 132, 255), (123, 76, 183), (69, 43, 134)),
+    'Babbage': ((224, 130, 145), (173, 65, 79), (134, 19, 36)),
+    'Colossus': ((114, 181, 234), (70, 121, 174), (41, 88, 128)),
+    'Dragon': ((129, 211, 129), (54, 149, 60), (37, 102, 37)),
+    'ENIAC': ((255, 227, 135), (201, 162, 69), (143, 121, 45)),
+    # Everything is just gray after this
+}
+
+_NAMED_DIVISION_INDICES = {name.lower(): i for i, name in enumerate(NAMED_DIVISIONS)}
+_GENERATED_DIVISION_KEY = re.compile(r'division(\d+)')
+
+
+def division_name(division_index: int) -> str:
+    """
+    Returns the name of the division at the given index, e.g. 'Quantum' for index 0, or 'Division 18' for index 17.
+    """
+    if division_index < len(NAMED_DIVISIONS):
+        return NAMED_DIVISIONS[division_index]
+    return f'Division {division_index + 1}'
+
+
+def division_names(count: int) -> List[str]:
+    return [division_name(i) for i in range(count)]
+
+
+def division_key(division_index: int) -> str:
+    """
+    Returns the name of the division as used in file names, e.g. 'quantum' or 'division18'.
+    """
+    return division_name(division_index).lower().replace(' ', '')
+
+
+def division_index_from_key(key: str) -> Optional[int]:
+    """
+    Returns the index of the division with the given file name key, or None if it is not a division key.
+    """
+    if key in _NAMED_DIVISION_INDICES:
+        return _NAMED_DIVISION_INDICES[key]
+    match = _GENERATED_DIVISION_KEY.fullmatch(key)
+    if match is not None and int(match.group(1)) > len(NAMED_DIVISIONS):
+        return int(match.group(1)) - 1
+    return None
+
+
+def division_palette(division_index: int) -> Palette:
+    return PALETTES.get(division_name(division_index), GRAY)
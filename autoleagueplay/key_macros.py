@@ -1,42 +1,157 @@
-import time
+"""
+Key presses sent to the Rocket League window, e.g. to hide the HUD or end a match. Finding the window is slow, so it
+is found once and reused, and key presses are sent from a background thread, so the match's tick loop never waits
+for them. When there is no game window to send keys to, e.g. on Linux, the key presses are ignored.
+"""
+import queue
+import sys
+import threading
+from typing import Optional
 
-from pywinauto.application import Application
+WINDOW_TITLE_RE = 'Rocket League.*'
+
+
+class KeyboardBackend:
+    """
+    Sends key presses to the game window. The keys use pywinauto's type_keys syntax.
+    """
+
+    def type_keys(self, keys: str, pause: float):
+        raise NotImplementedError()
+
+
+class NoopKeyboardBackend(KeyboardBackend):
+    """
+    Ignores all key presses. Used when there is no game window.
+    """
+
+    def type_keys(self, keys: str, pause: float):
+        pass
+
+
+class PywinautoKeyboardBackend(KeyboardBackend):
+    """
+    Types keys into the Rocket League window with pywinauto. The window is looked up on the first key press and
+    reused until it disappears, e.g. if the game is restarted.
+    """
+
+    def __init__(self, title_re: str = WINDOW_TITLE_RE):
+        self.title_re = title_re
+        self._window = None
+
+    def type_keys(self, keys: str, pause: float):
+        if self._window is None or not self._window.exists():
+            self._window = self._find_window()
+        try:
+            self._window.type_keys(keys, pause=pause)
+        except Exception:
+            # The window probably went away while typing. Look it up again next time.
+            self._window = None
+            raise
+
+    def _find_window(self):
+        from pywinauto.application import Application
+        app = Application()
+        app.connect(title_re=self.title_re)
+        return app.window_(title_re=self.title_re)
+
+
+class WindowController:
+    """
+    Queues batches of key presses and sends them to the game window from a background thread, in the order they
+    were queued. Each batch is sent with a single call to the backend.
+    """
+
+    def __init__(self, backend: KeyboardBackend):
+        self.backend = backend
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def send(self, keys: str, pause: float = 0.05):
+        """
+        Queues the keys and returns immediately.
+        :param pause: Seconds between each key press.
+        """
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='key-macros', daemon=True)
+                self._thread.start()
+        self._queue.put((keys, pause))
+
+    def flush(self):
+        """
+        Blocks until all queued keys have been sent.
+        """
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            keys, pause = self._queue.get()
+            try:
+                self.backend.type_keys(keys, pause)
+            except Exception as e:
+                print(f'Could not send keys {keys} to the game: {e}')
+            finally:
+                self._queue.task_done()
+
+
+_controller: Optional[WindowController] = None
+_controller_lock = threading.Lock()
+
+
+def get_window_controller() -> WindowController:
+    """
+    Returns the window controller shared by all matches in this process.
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            if sys.platform == 'win32':
+                _controller = WindowController(PywinautoKeyboardBackend())
+            else:
+                _controller = WindowController(NoopKeyboardBackend())
+        return _controller
+
+
+def set_window_controller(controller: WindowController):
+    """
+    Replaces the window controller of this process, e.g. with one using a NoopKeyboardBackend for headless runs.
+    """
+    global _controller
+    with _controller_lock:
+        _controller = controller
+
+
+def spectator_setup_macro():
+    """
+    Hides the HUD, switches to director spectating, shows the possession percentages, and hides bot rendering,
+    all in one batch of key presses.
+    """
+    get_window_controller().send("{h down}" "{h up}"
+                                 "{9 down}" "{9 up}"
+                                 "{HOME down}" "{HOME up}"
+                                 "{PGDN down}" "{PGDN up}")
 
 
 def hide_hud_macro():
-    app = Application()
-    app.connect(title_re='Rocket League.*')
-    win = app.window_(title_re='Rocket League.*')
-    win.type_keys("{h down}" "{h up}")
+    get_window_controller().send("{h down}" "{h up}")
 
 
 def do_director_spectating_macro():
-    app = Application()
-    app.connect(title_re='Rocket League.*')
-    win = app.window_(title_re='Rocket League.*')
-    win.type_keys("{9 down}" "{9 up}")
+    get_window_controller().send("{9 down}" "{9 up}")
 
 
 def hide_rendering_macro():
-    app = Application()
-    app.connect(title_re='Rocket League.*')
-    win = app.window_(title_re='Rocket League.*')
-    win.type_keys("{PGDN down}" "{PGDN up}")
+    get_window_controller().send("{PGDN down}" "{PGDN up}")
 
 
 def show_percentages_macro():
-    app = Application()
-    app.connect(title_re='Rocket League.*')
-    win = app.window_(title_re='Rocket League.*')
-    win.type_keys("{HOME down}" "{HOME up}")
+    get_window_controller().send("{HOME down}" "{HOME up}")
 
 
 def end_game_macro(save_a_qued_replay: bool):
-    app = Application()
-    app.connect(title_re='Rocket League.*')
-    win = app.window_(title_re='Rocket League.*')
-    for cmd in ["{ESC}", "{VK_UP}", "{ENTER}", "{VK_LEFT}", "{ENTER}"]:
-        win.type_keys(cmd)
-        time.sleep(0.1)
+    keys = "{ESC}" "{VK_UP}" "{ENTER}" "{VK_LEFT}" "{ENTER}"
     if save_a_qued_replay:
-        win.type_keys("{ENTER}")
+        keys += "{ENTER}"
+    get_window_controller().send(keys, pause=0.1)
@@ -3,6 +3,8 @@ from enum import Enum
 from pathlib import Path
 from typing import List, Tuple, Mapping
 
+from autoleagueplay.divisions import NAMED_DIVISIONS, division_names
+
 
 class RunStrategy(Enum):
     EVEN = 1
@@ -11,8 +13,8 @@ class RunStrategy(Enum):
 
 
 class Ladder:
-    DIVISION_NAMES = ('Quantum', 'Overclocked', 'Processor', 'Circuit', 'Transistor', 'Abacus', 'Babbage', 'Colossus',
-                 'Dragon', 'ENIAC', 'Ferranti', 'Grundy', 'Hobbit', 'Imagination', 'Jupiter', 'Komputer', 'Lambda')
+    # Only the divisions with proper names. Use divisions.division_name to name any division.
+    DIVISION_NAMES = NAMED_DIVISIONS
 
     def __init__(self, bots: List[str], division_size: int=4, overlap_size: int=1):
         self.bots = bots
@@ -20,6 +22,54 @@ class Ladder:
         self.overlap_size = overlap_size
         self.round_robin_size = division_size + overlap_size
 
+    @property
+    def bots(self) -> List[str]:
+        """
+        The bots on the ladder, best bot first. Don't modify the list directly, since the ladder also keeps the rank
+        of each bot. Assign a new list, or use swap and set_bot instead.
+        """
+        return self._bots
+
+    @bots.setter
+    def bots(self, bots: List[str]):
+        self._bots = bots
+        # Like list.index, a bot that appears twice gets the rank of its first appearance
+        self._ranks = {bot: rank for rank, bot in reversed(list(enumerate(bots)))}
+
+    def rank(self, bot: str) -> int:
+        """
+        Returns the index of the bot on the ladder. Raises a ValueError if the bot is not on the ladder.
+        """
+        rank = self._ranks.get(bot)
+        if rank is None:
+            raise ValueError(f'{bot} is not on the ladder')
+        return rank
+
+    def __contains__(self, bot: str) -> bool:
+        return bot in self._ranks
+
+    def set_bot(self, rank: int, bot: str):
+        """
+        Puts the bot at the given index, replacing the bot that was there. While a division is being rearranged a bot
+        can be in two slots at once, until its old slot is overwritten too.
+        """
+        old_bot = self._bots[rank]
+        if self._ranks.get(old_bot) == rank:
+            del self._ranks[old_bot]
+        self._bots[rank] = bot
+        self._ranks[bot] = rank
+
+    def swap(self, bot1: str, bot2: str):
+        """
+        Swaps the places of the two bots on the ladder.
+        """
+        rank1 = self.rank(bot1)
+        rank2 = self.rank(bot2)
+        self._bots[rank1] = bot2
+        self._bots[rank2] = bot1
+        self._ranks[bot1] = rank2
+        self._ranks[bot2] = rank1
+
     def division(self, division_index: int) -> List[str]:
         """
         Returns a list of bots in the division. Division at index 0 is Quantum, division at index 1 is Overclock, etc.
@@ -29,6 +79,9 @@ class Ladder:
     def division_count(self) -> int:
         return math.ceil(len(self.bots) / self.division_size)
 
+    def division_names(self) -> List[str]:
+        return division_names(self.division_count())
+
     def round_robin_participants(self, division_index: int) -> List[str]:
         """
         Returns a list of bots participating in the round robin based on division index. Division at index 0 is Quantum,
@@ -85,10 +138,10 @@ def ladder_differences(old_ladder: Ladder, new_ladder: Ladder) -> Tuple[List[str
     ranks_moved = {}
 
     for bot in new_ladder.bots:
-        if bot not in old_ladder.bots:
+        if bot not in old_ladder:
             new_bots.append(bot)
         else:
             # Finds out how much the bot moved. Positive numbers means it moved up and negative numbers means down
-            ranks_moved[bot] = (old_ladder.bots.index(bot) - new_ladder.bots.index(bot))
+            ranks_moved[bot] = (old_ladder.rank(bot) - new_ladder.rank(bot))
 
     return new_bots, ranks_moved
@@ -4,39 +4,30 @@ from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 
 # Getting symbol shapes.
+from autoleagueplay.divisions import NAMED_DIVISIONS, division_palette
 from autoleagueplay.leaderboard.leaderboard_paths import LeaderboardPaths
 from autoleagueplay.paths import WorkingDir
 
 class Symbols:
-    templates = {
-        # Symbol: (Image, description)
-        'new': (Image.open(LeaderboardPaths.templates / 'new.png'), 'New bot'),
-        'up': (Image.open(LeaderboardPaths.templates / 'up.png'), 'Rank up'),
-        'down': (Image.open(LeaderboardPaths.templates / 'down.png'), 'Rank down'),
-        'played': (Image.open(LeaderboardPaths.templates / 'played.png'), 'Played, but not moved'),
-    }
-
-    # Colour scheme for each division.
+    _templates = None
+
+    @staticmethod
+    def get_templates():
+        """Returns the symbol templates. The images are opened the first time they are needed."""
+        if Symbols._templates is None:
+            Symbols._templates = {
+                # Symbol: (Image, description)
+                'new': (Image.open(LeaderboardPaths.templates / 'new.png'), 'New bot'),
+                'up': (Image.open(LeaderboardPaths.templates / 'up.png'), 'Rank up'),
+                'down': (Image.open(LeaderboardPaths.templates / 'down.png'), 'Rank down'),
+                'played': (Image.open(LeaderboardPaths.templates / 'played.png'), 'Played, but not moved'),
+            }
+        return Symbols._templates
+
+    # Colour scheme for each named division. Symbols are only generated for these.
     palette = {
         # Division: ((light), (normal), (dark)) -> RGB values
-        'Quantum': ((218, 139, 249), (168, 85, 200), (99, 32, 135)),
-        'Overclocked': ((246, 138, 156), (206, 69, 90), (150, 11, 11)),
-        'Processor': ((82, 220, 234), (55, 151, 194), (20, 98, 117)),
-        'Circuit': ((134, 247, 131), (59, 186, 57), (26, 104, 24)),
-        'Transistor': ((250, 242, 168), (218, 207, 55), (158, 150, 27)),
-        'Abacus': ((183, 132, 255), (123, 76, 183), (69, 43, 134)),
-        'Babbage': ((224, 130, 145), (173, 65, 79), (134, 19, 36)),
-        'Colossus': ((114, 181, 234), (70, 121, 174), (41, 88, 128)),
-        'Dragon': ((129, 211, 129), (54, 149, 60), (37, 102, 37)),
-        'ENIAC': ((255, 227, 135), (201, 162, 69), (143, 121, 45)),
-        # Everything is just gray after this
-        'Ferranti': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
-        'Grundy': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
-        'Hobbit': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
-        'Imagination': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
-        'Jupiter': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
-        'Komputer': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
-        'Lambda': ((200, 200, 200), (98, 98, 98), (56, 56, 56)),
+        name: division_palette(i) for i, name in enumerate(NAMED_DIVISIONS)
     }
 
     LIGHT = 0
@@ -47,7 +38,7 @@ class Symbols:
 def generate_symbols():
     """Creates symbols"""
     palette = Symbols.palette
-    templates = Symbols.templates
+    templates = Symbols.get_templates()
     for div in palette:
         # TODO Do this with numpy to preserve alpha
 
@@ -86,7 +77,7 @@ def generate_symbols():
 
 def generate_legend(working_dir: WorkingDir):
     """Creates legend."""
-    templates = Symbols.templates
+    templates = Symbols.get_templates()
     legend = Image.new('RGB', (500, 400), (0, 0, 0))
     draw = ImageDraw.Draw(legend)
     font_type = ImageFont.truetype(str(LeaderboardPaths.font_regular), 32)
@@ -3,12 +3,16 @@ from datetime import datetime
 from pathlib import Path
 from typing import List
 
+from autoleagueplay.division_scheduler import get_round_robin_ranges
+from autoleagueplay.divisions import division_name
 from autoleagueplay.generate_matches import generate_round_robin_matches
 from autoleagueplay.ladder import Ladder, RunStrategy
 from autoleagueplay.load_bots import load_all_bots_versioned
-from autoleagueplay.match_result import MatchResult, CombinedScore
+from autoleagueplay.match_result import MatchResult
 from autoleagueplay.paths import WorkingDir
-from autoleagueplay.run_matches import get_round_robin_ranges, get_stale_match_result
+from autoleagueplay.result_table import ResultTable
+from autoleagueplay.scoring import calc_scores, event_seed
+from autoleagueplay.stale_rematches import get_stale_match_result
 
 
 def list_matches(working_dir: WorkingDir, run_strategy: RunStrategy, stale_rematch_threshold: int = 0,
@@ -38,8 +42,7 @@ def list_matches(working_dir: WorkingDir, run_strategy: RunStrategy, stale_remat
 
     # The divisions play in reverse order.
     for div_index in playing_division_indices[::-1]:
-        division_name = Ladder.DIVISION_NAMES[div_index] if div_index < len(Ladder.DIVISION_NAMES) else div_index
-        print(f'--- {division_name} division ---')
+        print(f'--- {division_name(div_index)} division ---')
 
         round_robin_ranges = get_round_robin_ranges(ladder, div_index, half_robin)
 
@@ -64,6 +67,7 @@ def list_matches(working_dir: WorkingDir, run_strategy: RunStrategy, stale_remat
 def list_results(working_dir: WorkingDir, run_strategy: RunStrategy, half_robin: bool):
     ladder = Ladder.read(working_dir.ladder)
     playing_division_indices = ladder.playing_division_indices(run_strategy)
+    seed = event_seed(ladder.bots)
 
     if len(ladder.bots) < 2:
         print(f'Not enough bots on the ladder to play any matches')
@@ -73,45 +77,40 @@ def list_results(working_dir: WorkingDir, run_strategy: RunStrategy, half_robin:
     with open(working_dir.results_overview, 'w') as f:
         f.write(f'Matches:\n')
 
+        session_results = working_dir.read_session_results()
+
         if run_strategy == RunStrategy.ROLLING or half_robin:
             # The ladder was dynamic, so we can't print divisions neatly.
             # Just print everything in one blob.
-            match_results = [MatchResult.read(path) for path in working_dir.match_results.glob('*')]
-            for result in match_results:
+            for result in session_results:
                 result_str = f'  (result: {result.blue_goals}-{result.orange_goals})'
                 f.write(f'{result.blue} vs {result.orange}{result_str}\n')
 
-            write_overall_scores(f, ladder.bots, match_results)
+            write_overall_scores(f, ladder.bots, session_results, seed)
 
         else:
             # The divisions play in reverse order, but we don't print them that way.
             for div_index in playing_division_indices:
-                f.write(f'--- {Ladder.DIVISION_NAMES[div_index]} division ---\n')
+                f.write(f'--- {division_name(div_index)} division ---\n')
 
                 rr_bots = ladder.round_robin_participants(div_index)
                 rr_matches = generate_round_robin_matches(rr_bots)
+                division_results = session_results.in_division(div_index)
 
                 for match_participants in rr_matches:
                     result_str = ''
-                    result_path = working_dir.get_match_result(div_index, match_participants[0], match_participants[1])
-                    if result_path.exists():
-                        result = MatchResult.read(result_path)
+                    pair_results = division_results.between(match_participants[0], match_participants[1])
+                    if len(pair_results) > 0:
+                        result = pair_results[0]
                         result_str = f'  (result: {result.blue_goals}-{result.orange_goals})'
                     f.write(f'{match_participants[0]} vs {match_participants[1]}{result_str}\n')
 
             f.write('\n')
 
-            # Print a table with all the combined scores
+            # Print a table with all the combined scores. Results of bots outside the round robin are ignored.
             for div_index in playing_division_indices:
                 rr_bots = ladder.round_robin_participants(div_index)
-                rr_matches = generate_round_robin_matches(rr_bots)
-                rr_results = []
-                for match_participants in rr_matches:
-                    result_path = working_dir.get_match_result(div_index, match_participants[0], match_participants[1])
-                    if result_path.exists():
-                        rr_results.append(MatchResult.read(result_path))
-
-                write_overall_scores(f, rr_bots, rr_results, div_index)
+                write_overall_scores(f, rr_bots, session_results.in_division(div_index), seed, div_index)
 
             f.write(f'--------------------------------+------+----------+-------+-------+-------+-------+\n')
 
@@ -122,17 +121,16 @@ def list_results(working_dir: WorkingDir, run_strategy: RunStrategy, half_robin:
     print(f'Result overview was written to \'{working_dir.results_overview}\'')
 
 
-def write_overall_scores(file, rr_bots: List[str], rr_results: List[MatchResult], div_index: int=-1):
+def write_overall_scores(file, rr_bots: List[str], rr_results: ResultTable, seed: int, div_index: int=-1):
     """
     Write a header and list of overall results in a table. Specifically, the table contains all the given bots' overall
     results based on the given list of results. If the div_index is set to a negative number, the header will
-    display 'All bots', otherwise it will be the name of the division.
+    display 'All bots', otherwise it will be the name of the division. The seed breaks ties, see event_seed.
     """
-    overall_scores = [CombinedScore.calc_score(bot, rr_results) for bot in rr_bots]
-    sorted_overall_scores = sorted(overall_scores)[::-1]
-    division_name = Ladder.DIVISION_NAMES[div_index] if div_index >= 0 else 'All Bots'
+    sorted_overall_scores = calc_scores(rr_bots, rr_results, seed)
+    title = division_name(div_index) if div_index >= 0 else 'All Bots'
     file.write(f'--------------------------------+------+----------+-------+-------+-------+-------+\n')
-    file.write(f'{division_name:<32}| Wins | GoalDiff | Goals | Shots | Saves | Score |\n')
+    file.write(f'{title:<32}| Wins | GoalDiff | Goals | Shots | Saves | Score |\n')
     file.write(f'--------------------------------+------+----------+-------+-------+-------+-------+\n')
     for score in sorted_overall_scores:
         file.write(
@@ -143,7 +141,7 @@ def write_overall_scores(file, rr_bots: List[str], rr_results: List[MatchResult]
 def parse_results(filename):
     """
     If you have the output of the list_results function as a text document, you can use this function to parse it
-    out into MatchResult objects. This is a slightly hacky utility function for manual use.
+    out into a ResultTable. This is a slightly hacky utility function for manual use.
     """
     with open(filename) as f:
         line_list = f.readlines()
@@ -169,7 +167,7 @@ def parse_results(filename):
 
             results.append(result)
 
-    return results
+    return ResultTable.from_results(results)
 
 
 def parse_results_and_write_files(working_dir: WorkingDir, results_file: Path, fallback_time: datetime):
@@ -194,4 +192,4 @@ def parse_results_and_write_files(working_dir: WorkingDir, results_file: Path, f
             result.blue, blue_time, result.orange, orange_time)
 
         print(f'Writing result to {result_path}')
-        result.write(result_path)
+        working_dir.write_version_specific_match_result(result, result_path)
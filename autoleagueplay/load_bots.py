@@ -1,17 +1,14 @@
 import os
-import subprocess
-import sys
 from datetime import datetime
-from os.path import relpath
 from pathlib import Path
 from typing import Dict, Mapping, Optional
 from zipfile import ZipFile
 
 from rlbot.parsing.bot_config_bundle import get_bot_config_bundle, BotConfigBundle
-from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
 
 from autoleagueplay.ladder import Ladder, RunStrategy
 from autoleagueplay.paths import PackageFiles, WorkingDir
+from autoleagueplay.timing import phase
 from autoleagueplay.versioned_bot import VersionedBot
 
 DEFAULT_TIMESTAMP = datetime(2015, 7, 15, 0, 0, 0)  # Rocket League release date :)
@@ -68,30 +65,17 @@ def check_bot_folder(working_dir: WorkingDir, run_strategy: Optional[RunStrategy
 
 
 def load_all_bots_versioned(working_dir: WorkingDir) -> Mapping[str, VersionedBot]:
+    with phase('bot loading'):
+        return _load_all_bots_versioned(working_dir)
 
-    bot_folders = [p for p in working_dir.bots.iterdir() if p.is_dir()]
-    root = working_dir._working_dir
-    versioned_bots = set()
-
-    for folder in bot_folders:
-        relative_path = relpath(folder, root)
 
-        date = None
-        try:
-            iso_date_binary = subprocess.check_output(
-                ["git", "log", "-n", "1", '--format="%ad"', "--date=iso-strict", "--", relative_path], cwd=root)
-            iso_date = iso_date_binary.decode(sys.stdout.encoding).strip("\"\n")
+def _load_all_bots_versioned(working_dir: WorkingDir) -> Mapping[str, VersionedBot]:
 
-            if len(iso_date) > 0:
-                date = datetime.fromisoformat(iso_date)
-        except Exception:
-            pass
-
-        if date is None:
-            date = get_modified_date(folder)
+    versioned_bots = set()
 
-        for bot_config in scan_directory_for_bot_configs(folder):
-            versioned_bot = VersionedBot(bot_config, date)
+    for entry in working_dir.get_bot_registry().load().values():
+        for bot_config in entry.bots:
+            versioned_bot = VersionedBot(bot_config, entry.updated_date)
             versioned_bots.add(versioned_bot)
 
     psyonix_allstar, psyonix_pro, psyonix_rookie = load_psyonix_bots()
@@ -105,24 +89,8 @@ def load_all_bots_versioned(working_dir: WorkingDir) -> Mapping[str, VersionedBo
     }
 
 
-def get_modified_date(folder) -> datetime:
-    ignored_directories = ['__pycache__', '.git']
-    ignored_files = ['RLBot_Core_Interface.dll']
-    ignored_types = ['.cfg']
-    max_timestamp = 0
-    for root, dirs, files in os.walk(folder, topdown=True):
-        dirs[:] = [d for d in dirs if d not in ignored_directories]
-        times = [os.stat(os.path.join(root, f)).st_mtime for f in files
-                 if f not in ignored_files and Path(f).suffix not in ignored_types]
-        if len(times) > 0:
-            timestamp = max(times)
-            if timestamp > max_timestamp:
-                max_timestamp = timestamp
-
-    return datetime.fromtimestamp(max_timestamp)
-
-
 def unzip_all_bots(working_dir: WorkingDir):
+    extracted_dirs = []
     for root, dirs, files in os.walk(working_dir._working_dir, topdown=True):
         dirs[:] = [d for d in dirs]
         for file in files:
@@ -144,6 +112,11 @@ def unzip_all_bots(working_dir: WorkingDir):
                         time_from_zip = datetime(*zip_info.date_time[0:6])
                         seconds = int(time_from_zip.timestamp())
                         os.utime(extracted_path, (seconds, seconds))
+                    extracted_dirs.append(Path(target_dir))
+
+    if len(extracted_dirs) > 0:
+        # The extracted files keep the dates from the zip, so the bot registry can't tell that these folders changed
+        working_dir.get_bot_registry().forget(extracted_dirs)
 
 
 def is_already_unzipped(zipfile):
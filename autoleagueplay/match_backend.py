@@ -0,0 +1,82 @@
+"""
+Match backends decide where matches are played. The Rocket League backend (MatchSession in run_matches) plays them
+in the game, while the simulated backend plays them in memory, which is useful for testing and benchmarking the rest
+of autoleagueplay without launching the game.
+"""
+from typing import Optional
+
+from rlbot.training.training import Fail, Result
+from rlbot.utils.structures.game_interface import GameInterface
+
+from autoleagueplay.match_exercise import MatchExercise, MatchGrader, MercyRule
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.replay_upload import get_replay_uploader
+from autoleagueplay.replays import ReplayMonitor, ReplayPreference
+from autoleagueplay.timing import MATCH_PHASE, phase
+
+
+class MatchBackend:
+    """
+    Plays exercises, e.g. matches graded by a MatchGrader, and returns their result.
+    Subclasses decide how by implementing run_exercise.
+    """
+
+    # True if there is no game window, so graders shouldn't press keys or wait for the game
+    headless = False
+
+    def run_exercise(self, exercise: MatchExercise) -> Result:
+        raise NotImplementedError()
+
+    def get_game_interface(self) -> Optional[GameInterface]:
+        return None
+
+    def close(self):
+        pass
+
+    def run_match(self, participant_1: str, participant_2: str, match_config,
+                  replay_preference: ReplayPreference) -> MatchResult:
+        with phase(MATCH_PHASE, match=f'{participant_1} vs {participant_2}'):
+            return self._run_match(participant_1, participant_2, match_config, replay_preference)
+
+    def _run_match(self, participant_1: str, participant_2: str, match_config,
+                   replay_preference: ReplayPreference) -> MatchResult:
+        if replay_preference == ReplayPreference.CALCULATED_GG and get_replay_uploader() is None:
+            # Checked before the match, since the result would be thrown away if its replay couldn't be queued
+            raise Exception('Replays can only be uploaded after start_replay_uploads or prepare_replay_uploads '
+                            'has been called')
+        print(f'Starting match: {participant_1} vs {participant_2}. Waiting for match to finish...')
+        replay_monitor = ReplayMonitor(replay_preference=replay_preference)
+        match = MatchExercise(
+            name=f'{participant_1} vs {participant_2}',
+            match_config=match_config,
+            grader=MatchGrader(
+                mercy_rule=MercyRule(game_interface=self.get_game_interface(), headless=self.headless),
+                replay_monitor=replay_monitor,
+                headless=self.headless,
+            )
+        )
+
+        try:
+            exercise_result = self.run_exercise(match)
+        finally:
+            # The grader stops monitoring when it is done, but not if the match crashed
+            replay_monitor.stop_monitoring()
+
+        # Warn users if no replay was found
+        if isinstance(exercise_result.grade, Fail) and exercise_result.exercise.grader.replay_monitor.replay_id == None:
+            print(f'WARNING: No replay was found for the match \'{participant_1} vs {participant_2}\'. Is Bakkesmod injected and \'Automatically save all replays\' enabled?')
+
+        # The grader gives up without a result if the exercise itself crashed
+        match_result = exercise_result.exercise.grader.match_result
+        if match_result is None:
+            raise Exception(f'No result: {exercise_result.grade}')
+
+        match_result.replay_hash = replay_monitor.file_replay()
+        match_result.tick_stats = exercise_result.exercise.grader.tick_stats.to_json()
+        return match_result
+
+    def __enter__(self) -> 'MatchBackend':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
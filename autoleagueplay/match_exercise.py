@@ -1,5 +1,6 @@
 import time
 from dataclasses import dataclass, field
+from enum import Enum
 from typing import Optional
 
 from rlbot.setup_manager import SetupManager
@@ -14,7 +15,8 @@ from rlbottraining.training_exercise import TrainingExercise
 
 from autoleagueplay.match_result import MatchResult
 from autoleagueplay.replays import ReplayPreference, ReplayMonitor
-from autoleagueplay.key_macros import hide_hud_macro, do_director_spectating_macro, hide_rendering_macro, show_percentages_macro, end_game_macro
+from autoleagueplay.timing import TickStats, timer
+from autoleagueplay.key_macros import spectator_setup_macro, end_game_macro
 
 
 @dataclass
@@ -22,6 +24,7 @@ class MercyRule:
 
     required_goal_diff: int = 7
     game_interface: GameInterface = None
+    headless: bool = False  # True if there is no game to save replays in or press keys in
 
     mercy_detected: bool = False
     game_ended: bool = False
@@ -33,11 +36,13 @@ class MercyRule:
         # The mercy is detected as soon as the goal is scored. We want to watch the replay of the goal so
         # the match is terminated once we see the following kickoff
         if abs(blue_score - orange_score) >= self.required_goal_diff and not self.mercy_detected:
-            self.que_save_replay()
+            if not self.headless:
+                self.que_save_replay()
             self.mercy_detected = True
         elif not self.game_ended and packet.game_info.is_kickoff_pause and self.mercy_detected:
             self.game_ended = True
-            end_game_macro(True)
+            if not self.headless:
+                end_game_macro(True)
 
     def que_save_replay(self):
         game_state = GameState(console_commands=["QueSaveReplay"])
@@ -49,6 +54,16 @@ class FailDueToNoReplay(Fail):
         return 'FAIL: Match finished but no replay was written to disk.'
 
 
+class GraderState(Enum):
+    PLAYING = 'playing'
+    LEAVING_MATCH = 'leaving match'  # The mercy rule ended the game. Waiting for the game to load the main menu.
+    WAITING_FOR_REPLAY = 'waiting for replay'
+
+
+# Seconds to wait after the mercy rule ended the game, for the game to load the main menu and save the replay
+LEAVE_MATCH_SECONDS = 1.0
+
+
 @dataclass
 class MatchGrader(Grader):
 
@@ -61,43 +76,84 @@ class MatchGrader(Grader):
     saw_active_packets = False
 
     has_pressed_h = False
+    headless: bool = False  # True if there is no game window, e.g. in simulations. Skips key presses and waits.
+
+    # Ticks must never block, since the game keeps sending packets. Anything that takes time is done in the
+    # background, and the grader checks on it in the following ticks, depending on its state.
+    state: GraderState = GraderState.PLAYING
+    leave_match_until: Optional[float] = None
+    tick_stats: TickStats = field(default_factory=TickStats)
+
+    # time.perf_counter() timestamps of the phases of the match, for timing
+    created_at: float = field(default_factory=time.perf_counter)
+    first_tick_at: Optional[float] = None
+    match_ended_at: Optional[float] = None
 
     def on_tick(self, tick: TrainingTickPacket) -> Optional[Grade]:
-        if not self.has_pressed_h:
-            hide_hud_macro()
-            do_director_spectating_macro()
-            show_percentages_macro()
-            hide_rendering_macro()
+        tick_started_at = time.perf_counter()
+        try:
+            return self._grade_tick(tick)
+        finally:
+            self.tick_stats.add(time.perf_counter() - tick_started_at)
+
+    def _grade_tick(self, tick: TrainingTickPacket) -> Optional[Grade]:
+        if self.first_tick_at is None:
+            # Everything until now was spent loading the match and starting the bots
+            self.first_tick_at = time.perf_counter()
+            timer.record('match setup', since=self.created_at)
+
+        if not self.has_pressed_h and not self.headless:
+            spectator_setup_macro()  # Sent in the background, so the tick doesn't wait for the key presses
             self.has_pressed_h = True
 
         self.replay_monitor.ensure_monitoring()
 
         # Check for mercy rule
-        self.mercy_rule.check_for_mercy(tick.game_tick_packet)
-        if self.mercy_rule.game_ended:
-            self.match_result = fetch_match_score(tick.game_tick_packet)
-            time.sleep(1)  # Give time for replay_monitor to register replay and for RL to load main menu
-            if self.replay_monitor.replay_id or self.replay_monitor.replay_preference == ReplayPreference.IGNORE_REPLAY:
-                self.replay_monitor.stop_monitoring()
-                return Pass()
+        if self.state == GraderState.PLAYING:
+            self.mercy_rule.check_for_mercy(tick.game_tick_packet)
+            if self.mercy_rule.game_ended:
+                self._mark_match_ended()
+                self.match_result = fetch_match_score(tick.game_tick_packet)
+                self.state = GraderState.LEAVING_MATCH
+                # Give time for replay_monitor to register replay and for RL to load main menu
+                self.leave_match_until = time.perf_counter() + (0 if self.headless else LEAVE_MATCH_SECONDS)
+        if self.state == GraderState.LEAVING_MATCH:
+            if time.perf_counter() < self.leave_match_until:
+                return None
+            self.state = GraderState.WAITING_FOR_REPLAY
 
-        # Check if game is over and replay recorded
         self.last_game_tick_packet = tick.game_tick_packet
         game_info = tick.game_tick_packet.game_info
-        if game_info.is_match_ended and self.saw_active_packets:
+        if self.state == GraderState.PLAYING:
+            if not (game_info.is_match_ended and self.saw_active_packets):
+                if game_info.is_round_active and not game_info.is_match_ended:
+                    self.saw_active_packets = True
+                self.last_match_time = game_info.seconds_elapsed
+                return None
+            # The game is over, so the score is final and only has to be fetched once
+            self._mark_match_ended()
             self.match_result = fetch_match_score(tick.game_tick_packet)
-            if self.replay_monitor.replay_id or self.replay_monitor.replay_preference == ReplayPreference.IGNORE_REPLAY:
-                self.replay_monitor.stop_monitoring()
-                return Pass()
-            seconds_since_game_end = game_info.seconds_elapsed - self.last_match_time
-            if seconds_since_game_end > 15:
-                self.replay_monitor.stop_monitoring()
-                return FailDueToNoReplay()
-        else:
-            if game_info.is_round_active and not game_info.is_match_ended:
-                self.saw_active_packets = True
-            self.last_match_time = game_info.seconds_elapsed
-            return None
+            self.state = GraderState.WAITING_FOR_REPLAY
+
+        # Wait for the replay to be recorded
+        if self.replay_monitor.replay_id or self.replay_monitor.replay_preference == ReplayPreference.IGNORE_REPLAY:
+            self.replay_monitor.stop_monitoring()
+            return self._finish(Pass())
+        seconds_since_game_end = game_info.seconds_elapsed - self.last_match_time
+        if seconds_since_game_end > 15:
+            self.replay_monitor.stop_monitoring()
+            return self._finish(FailDueToNoReplay())
+        return None
+
+    def _mark_match_ended(self):
+        if self.match_ended_at is None:
+            self.match_ended_at = time.perf_counter()
+            timer.record('match play', since=self.first_tick_at)
+
+    def _finish(self, grade: Grade) -> Grade:
+        # The time from the end of the match until now was spent waiting for the replay to be saved
+        timer.record('replay wait', since=self.match_ended_at)
+        return grade
 
 
 def fetch_match_score(packet: GameTickPacket):
@@ -1,19 +1,26 @@
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 
 from autoleagueplay.match_result import MatchResult
+from autoleagueplay.result_table import ResultTable
 
 
 class MatchHistory:
 
-    def __init__(self, match_files: List[Path]):
-        self.match_files = match_files
-        self.match_files.sort(reverse=True)
-        self.results = [MatchResult.read(path) for path in self.match_files]
+    def __init__(self, results: Union[ResultTable, List[MatchResult]]):
+        """
+        :param results: The match results between two specific bot versions, with the most recent match first.
+        """
+        self.results = results if isinstance(results, ResultTable) else ResultTable.from_results(results)
+
+    @staticmethod
+    def from_files(match_files: List[Path]) -> 'MatchHistory':
+        match_files = sorted(match_files, reverse=True)
+        return MatchHistory(ResultTable.read(match_files))
 
     def is_empty(self):
-        return len(self.match_files) == 0
+        return len(self.results) == 0
 
     def get_latest_result(self):
         if self.is_empty():
@@ -25,36 +32,21 @@ class MatchHistory:
         if self.is_empty():
             return None
 
-        blue = self.results[0].blue
-        orange = self.results[0].orange
-
-        wins = dict()
-        wins[blue] = 0
-        wins[orange] = 0
-
-        num_games = 0
-        for match_result in self.results:
-            num_games += 1
-            if num_games > games_to_check:
-                break
-            if match_result.winner == blue:
-                wins[blue] += 1
-            elif match_result.winner == orange:
-                wins[orange] += 1
-            else:
-                raise Exception(f'Unexpected bot name {match_result.winner} when analyzing history.')
-        return wins
+        latest_result = self.get_latest_result()
+        return self.results[:games_to_check].win_counts([latest_result.blue, latest_result.orange])
 
     def get_current_streak_length(self):
+        return self.results.streak_length()
 
-        latest_winner = self.get_latest_result().winner
-
-        streak = 0
-        for match_result in self.results:
-            if match_result.winner != latest_winner:
-                break
-            streak += 1
-        return streak
+    def get_head_to_head(self) -> Optional['HeadToHead']:
+        """
+        Returns a summary of the history, or None if it is empty.
+        """
+        if self.is_empty():
+            return None
+        latest_result = self.get_latest_result()
+        return HeadToHead(latest_result, self.get_current_streak_length(),
+                          self.results.win_counts([latest_result.blue, latest_result.orange]))
 
     @staticmethod
     def make_result_file_prefix(versioned_bot_key_1: str, versioned_bot_key_2: str):
@@ -66,3 +58,37 @@ class MatchHistory:
     def make_result_file_name(versioned_bot_key_1: str, versioned_bot_key_2: str, time: datetime):
         prefix = MatchHistory.make_result_file_prefix(versioned_bot_key_1, versioned_bot_key_2)
         return f'{prefix}_at_{time.isoformat().replace(":", "-")}.json'
+
+
+class HeadToHead:
+    """
+    A summary of the match history between two specific bot versions: the latest result, how many times in a row
+    the latest winner has won, and how many matches each bot has won in total. It can be updated one result at a time,
+    so it doesn't have to be recomputed from the whole history whenever a match is played.
+    """
+
+    def __init__(self, latest_result: MatchResult, streak: int, win_counts: Dict[str, int]):
+        self.latest_result = latest_result
+        self.streak = streak
+        self.win_counts = win_counts
+
+    @property
+    def latest_winner(self) -> str:
+        return self.latest_result.winner
+
+    @staticmethod
+    def first(result: MatchResult) -> 'HeadToHead':
+        win_counts = {result.blue: 0, result.orange: 0}
+        win_counts[result.winner] += 1
+        return HeadToHead(result, 1, win_counts)
+
+    def after(self, result: MatchResult) -> 'HeadToHead':
+        """
+        Returns the head to head once the given result, which is newer than the latest result, has been added.
+        """
+        streak = self.streak + 1 if result.winner == self.latest_winner else 1
+        win_counts = dict(self.win_counts)
+        win_counts.setdefault(result.blue, 0)
+        win_counts.setdefault(result.orange, 0)
+        win_counts[result.winner] += 1
+        return HeadToHead(result, streak, win_counts)
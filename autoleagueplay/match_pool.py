@@ -0,0 +1,192 @@
+"""
+Pools of workers that play matches concurrently. Each worker owns whatever it needs to play a match, e.g. its own
+game instance, and the pool hands out matches to whichever worker is free. The scheduling thread receives the
+results and takes care of storing them, so workers never touch the working directory.
+"""
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.versioned_bot import VersionedBot
+
+
+@dataclass
+class MatchJob:
+    """
+    A match that should be played. The division index and sort index are only used for bookkeeping by the scheduler.
+    """
+    div_index: int
+    blue: VersionedBot
+    orange: VersionedBot
+    team_size: int = 1
+    sort_index: Optional[int] = None  # The rank of the upper bot, for matches between neighbours in a sort
+
+    def __str__(self):
+        return f'{self.blue.bot_config.name} vs {self.orange.bot_config.name}'
+
+
+class MatchWorker:
+    """
+    Plays matches one at a time. Subclasses decide how, e.g. by launching Rocket League or by faking results.
+    """
+
+    def play(self, job: MatchJob) -> MatchResult:
+        raise NotImplementedError()
+
+    def prepare(self, job: MatchJob):
+        """
+        Called on a background thread while the worker is still busy, with the match it will most likely play next.
+        Workers can use it to do slow setup ahead of time. The worker may end up playing a different match.
+        """
+        pass
+
+    def rest(self):
+        """
+        Called after a match has been played and its result has been handed back, before the worker gets a new match.
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class MatchEvent:
+    """
+    Reported by a match pool when a match has started or finished. A finished match has either a result or an error.
+    """
+
+    def __init__(self, job: MatchJob, started: bool, result: Optional[MatchResult] = None,
+                 error: Optional[BaseException] = None):
+        self.job = job
+        self.started = started
+        self.result = result
+        self.error = error
+
+
+class MatchPool:
+    """
+    Plays submitted matches and returns the results in the order the matches finish. Subclasses decide who plays the
+    matches and report progress by putting MatchEvents in self.events. Callbacks are always invoked on the thread
+    that consumes the results.
+    Usage:
+    >>> with WorkerPool(workers) as pool:
+    ...     for job, result in pool.run(jobs):
+    ...         ...
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self._pending = 0
+
+    def __enter__(self) -> 'MatchPool':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, job: MatchJob):
+        self._pending += 1
+        self._dispatch(job)
+
+    def has_pending(self) -> bool:
+        return self._pending > 0
+
+    def next_result(self, on_start: Callable[[MatchJob], None] = None) -> Tuple[MatchJob, MatchResult]:
+        """
+        Blocks until a submitted match is finished and returns it. If the match could not be played, the
+        exception is raised here.
+        """
+        assert self.has_pending(), 'No matches have been submitted'
+        while True:
+            event = self.events.get()
+            if event.started:
+                if on_start is not None:
+                    on_start(event.job)
+                continue
+            self._pending -= 1
+            if event.error is not None:
+                raise event.error
+            return event.job, event.result
+
+    def run(self, jobs: Iterable[MatchJob],
+            on_start: Callable[[MatchJob], None] = None) -> Iterator[Tuple[MatchJob, MatchResult]]:
+        """
+        Submits all the jobs and yields each job and its result as they finish.
+        """
+        for job in jobs:
+            self.submit(job)
+        while self.has_pending():
+            yield self.next_result(on_start)
+
+    def close(self):
+        pass
+
+    def _dispatch(self, job: MatchJob):
+        raise NotImplementedError()
+
+
+class WorkerPool(MatchPool):
+    """
+    Distributes matches to a list of local workers, each running on its own thread.
+    """
+
+    def __init__(self, workers: List[MatchWorker]):
+        super().__init__()
+        assert len(workers) > 0, 'A match pool needs at least one worker'
+        self.workers = workers
+        self._jobs = queue.Queue()
+        self._threads = []
+        for i, worker in enumerate(workers):
+            thread = threading.Thread(target=self._work, args=(worker,), name=f'match-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _dispatch(self, job: MatchJob):
+        self._jobs.put(job)
+
+    def close(self):
+        # Drop matches that haven't started yet, then let the workers finish their current match and stop
+        try:
+            while True:
+                self._jobs.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        for worker in self.workers:
+            worker.close()
+
+    def _work(self, worker: MatchWorker):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            self.events.put(MatchEvent(job, started=True))
+            self._prepare_next(worker)
+            try:
+                result = worker.play(job)
+            except BaseException as e:
+                self.events.put(MatchEvent(job, started=False, error=e))
+                continue
+            self.events.put(MatchEvent(job, started=False, result=result))
+            # More matches may have been submitted while this one was played
+            self._prepare_next(worker)
+            worker.rest()
+
+    def _prepare_next(self, worker: MatchWorker):
+        with self._jobs.mutex:
+            next_job = self._jobs.queue[0] if len(self._jobs.queue) > 0 else None
+        if next_job is not None:
+            threading.Thread(target=_prepare_quietly, args=(worker, next_job), daemon=True).start()
+
+
+def _prepare_quietly(worker: MatchWorker, job: MatchJob):
+    # Preparing is only an optimization. If it fails, the match is set up the normal way when it is played.
+    try:
+        worker.prepare(job)
+    except Exception as e:
+        print(f'Could not prepare {job} ahead of time: {e}')
@@ -1,16 +1,21 @@
 import json
-import random
+import zlib
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
 
 class MatchResult:
     """
-    Object that contains relevant info about a match result
+    Object that contains relevant info about a match result. Collections of many results are stored in a ResultTable,
+    which hands out MatchResults when indexed.
     """
 
+    __slots__ = ('blue', 'orange', 'blue_goals', 'orange_goals', 'blue_shots', 'orange_shots',
+                 'blue_saves', 'orange_saves', 'blue_points', 'orange_points', 'replay_hash', 'tick_stats')
+
     def __init__(self, blue: str, orange: str, blue_goals: int, orange_goals: int, blue_shots: int, orange_shots: int,
-                 blue_saves: int, orange_saves: int, blue_points: int, orange_points: int):
+                 blue_saves: int, orange_saves: int, blue_points: int, orange_points: int,
+                 replay_hash: Optional[str] = None, tick_stats: Optional[Dict[str, Any]] = None):
         self.blue = blue
         self.orange = orange
         self.blue_goals = blue_goals
@@ -21,29 +26,49 @@ class MatchResult:
         self.orange_saves = orange_saves
         self.blue_points = blue_points
         self.orange_points = orange_points
-        self.winner = blue if blue_goals > orange_goals else orange
-        self.loser = blue if blue_goals < orange_goals else orange
+        self.replay_hash = replay_hash  # The replay's name in the replay archive, if it was archived
+        self.tick_stats = tick_stats  # How long the grader took to handle each tick, see TickStats.to_json
+
+    @property
+    def winner(self) -> str:
+        return self.blue if self.blue_goals > self.orange_goals else self.orange
+
+    @property
+    def loser(self) -> str:
+        return self.blue if self.blue_goals < self.orange_goals else self.orange
+
+    def to_json(self) -> Dict[str, Any]:
+        # The winner and loser are written too, since overlays and older tools read them from the result files
+        data = {field: getattr(self, field) for field in MatchResult.__slots__}
+        data['winner'] = self.winner
+        data['loser'] = self.loser
+        return data
 
     def write(self, path: Path):
         with open(path, 'w') as f:
-            json.dump(self.__dict__, f, indent=4)
+            json.dump(self.to_json(), f, indent=4)
+
+    @staticmethod
+    def from_json(data: Dict[str, Any]) -> 'MatchResult':
+        return MatchResult(
+                            blue=data['blue'],
+                            orange=data['orange'],
+                            blue_goals=int(data['blue_goals']),
+                            orange_goals=int(data['orange_goals']),
+                            blue_shots=int(data['blue_shots']),
+                            orange_shots=int(data['orange_shots']),
+                            blue_saves=int(data['blue_saves']),
+                            orange_saves=int(data['orange_saves']),
+                            blue_points=int(data['blue_points']),
+                            orange_points=int(data['orange_points']),
+                            replay_hash=data.get('replay_hash'),
+                            tick_stats=data.get('tick_stats')
+                        )
 
     @staticmethod
     def read(path: Path) -> 'MatchResult':
         with open(path, 'r') as f:
-            data = json.load(f)
-            return MatchResult(
-                                blue=data['blue'],
-                                orange=data['orange'],
-                                blue_goals=int(data['blue_goals']),
-                                orange_goals=int(data['orange_goals']),
-                                blue_shots=int(data['blue_shots']),
-                                orange_shots=int(data['orange_shots']),
-                                blue_saves=int(data['blue_saves']),
-                                orange_saves=int(data['orange_saves']),
-                                blue_points=int(data['blue_points']),
-                                orange_points=int(data['orange_points'])
-                            )
+            return MatchResult.from_json(json.load(f))
 
 
 class CombinedScore:
@@ -51,7 +76,8 @@ class CombinedScore:
     Object used to a hold a bot's combined performance across multiple matches. CombinedPerformances can be compared.
     """
 
-    def __init__(self, bot: str, wins: int, goal_diff: int, goals: int, shots: int, saves: int, points: int):
+    def __init__(self, bot: str, wins: int, goal_diff: int, goals: int, shots: int, saves: int, points: int,
+                 seed: int = 0):
         self.bot = bot
         self.wins = wins
         self.goal_diff = goal_diff
@@ -59,6 +85,7 @@ class CombinedScore:
         self.shots = shots
         self.saves = saves
         self.points = points
+        self.tie_break = tie_break_key(bot, seed)
 
     def __lt__(self, other: 'CombinedScore') -> bool:
         # Defining this allows us to compare different bots' performance
@@ -75,7 +102,10 @@ class CombinedScore:
             return self.saves < other.saves
         if self.points != other.points:
             return self.points < other.points
-        return random.randint(0, 1) == 0
+        # Completely equal bots are ordered by a seeded coin flip, which is the same every time the scores are sorted
+        if self.tie_break != other.tie_break:
+            return self.tie_break < other.tie_break
+        return self.bot < other.bot
 
     @staticmethod
     def calc_score(bot: str, match_results: List[MatchResult]) -> 'CombinedScore':
@@ -98,3 +128,11 @@ class CombinedScore:
                 score.saves += result.orange_saves
                 score.points += result.orange_points
         return score
+
+
+def tie_break_key(bot: str, seed: int = 0) -> int:
+    """
+    Returns a pseudo-random number for the bot which only depends on the bot's name and the seed.
+    It is used to break ties between bots that performed equally well.
+    """
+    return zlib.crc32(f'{seed}:{bot}'.encode('utf-8'))
@@ -23,7 +23,7 @@ class OverlayData:
         self.blue_config_path = blue_bot.bot_config.config_path if blue_bot is not None else None
         self.orange_config_path = orange_bot.bot_config.config_path if orange_bot is not None else None
         self.ladder = ladder.bots
-        self.division_names = Ladder.DIVISION_NAMES[:ladder.division_count()]
+        self.division_names = ladder.division_names()
         self.old_match_result = {
             'winner': old_match_result.winner,
             'loser': old_match_result.loser,
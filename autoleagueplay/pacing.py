@@ -0,0 +1,82 @@
+"""
+Decides how long autoleagueplay pauses to let the overlay show something, e.g. the result of a match.
+The pauses are not needed for anything else, so headless runs can turn them off entirely.
+
+An overlay can tell autoleagueplay that it has shown the latest current_match.json by touching the ack file
+(current_match_ack in the working directory) after reading it. Once the ack file is newer than current_match.json
+the pause ends early. Overlays that don't know about the ack file get the full pause, as they always have.
+Pauses that show something in the game rather than on the overlay, e.g. the scoreboard after a match, ignore the ack.
+"""
+import time
+from pathlib import Path
+from typing import Optional
+
+from autoleagueplay.timing import phase
+
+POLL_INTERVAL = 0.05  # seconds between checks of the ack file
+
+
+class Pacer:
+    """
+    :param overlay_file: The file the overlay reads.
+    :param ack_file: The file the overlay touches when it has shown the content of the overlay file.
+    :param max_dwell: The longest pause in seconds. None means every pause uses its own duration, 0 means no pauses.
+    """
+
+    def __init__(self, overlay_file: Optional[Path] = None, ack_file: Optional[Path] = None,
+                 max_dwell: Optional[float] = None):
+        self.overlay_file = overlay_file
+        self.ack_file = ack_file
+        self.max_dwell = max_dwell
+
+    @staticmethod
+    def for_working_dir(working_dir, max_dwell: Optional[float] = None) -> 'Pacer':
+        return Pacer(working_dir.overlay_interface, working_dir.overlay_ack, max_dwell)
+
+    @staticmethod
+    def headless() -> 'Pacer':
+        return Pacer(max_dwell=0)
+
+    def dwell(self, seconds: float):
+        """
+        Pauses for the given number of seconds, capped by max_dwell, or until the overlay acknowledges that it has
+        shown the current overlay file.
+        """
+        if self.max_dwell is not None:
+            seconds = min(seconds, self.max_dwell)
+        if seconds <= 0:
+            return
+
+        with phase('dwell'):
+            self._wait(seconds, use_ack=True)
+
+    def pause(self, seconds: float):
+        """
+        Pauses for the given number of seconds, capped by max_dwell. Unlike dwell, the overlay can't end the pause early,
+        since what is shown during it is not the overlay file.
+        """
+        if self.max_dwell is not None:
+            seconds = min(seconds, self.max_dwell)
+        if seconds <= 0:
+            return
+
+        with phase('dwell'):
+            self._wait(seconds, use_ack=False)
+
+    def _wait(self, seconds: float, use_ack: bool):
+        deadline = time.monotonic() + seconds
+        while True:
+            if use_ack and self._is_acknowledged():
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(POLL_INTERVAL, remaining))
+
+    def _is_acknowledged(self) -> bool:
+        if self.overlay_file is None or self.ack_file is None:
+            return False
+        try:
+            return self.ack_file.stat().st_mtime_ns >= self.overlay_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
@@ -2,6 +2,7 @@
 # ladder.txt   # Contains current ladder. Bot names separated by newlines.
 # ladder_new.txt   # The ladder generated. Contains resulting ladder. Bot names separated by newlines.
 # current_match.json    # Contains some information about the current match. Used by overlay scripts.
+# current_match_ack    # Touched by overlay scripts when they have shown current_match.json. Optional.
 # bots/
 #     skybot/..
 #     botimus/..
@@ -11,6 +12,18 @@
 #     quantum_bot1_vs_bot2_result.json
 #     quantum_bot1_vs_bot3_result.json
 #     ...
+# versioned_results/
+#     # Results tagged with the specific code versions of the bots participating
+#     ...
+# versioned_results.sqlite    # Index over versioned_results/. Can be deleted, it is rebuilt from the json files.
+# bot_registry.json    # Cache of the bots found in bots/. Can be deleted, it is rebuilt by rescanning bots/.
+# trace.jsonl    # How long each phase of each league play event took. One json object per line.
+# sort_journal.jsonl    # Swaps made by a bubble sort since ladder.txt was last written. Replayed after a crash.
+# replay_uploads.json    # The replays queued for upload to calculated.gg, and whether they have been uploaded.
+# replays/
+#     # Archived replays, gzipped and named by the sha256 hash of their content
+#     3f/3f9a...c1.replay.gz
+#     ...
 #
 
 """
@@ -18,13 +31,14 @@ This module contains file system paths that are used by autoleagueplay.
 """
 from datetime import datetime
 from pathlib import Path
-from typing import Mapping, List
-
-from rlbot.parsing.bot_config_bundle import BotConfigBundle
-from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
-
-from autoleagueplay.ladder import Ladder
-from autoleagueplay.match_history import MatchHistory
+from typing import Mapping, List, Optional
+
+from autoleagueplay.bot_registry import BotRegistry, LazyBotConfig
+from autoleagueplay.divisions import division_index_from_key, division_key
+from autoleagueplay.match_history import HeadToHead, MatchHistory
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.result_store import ResultStore
+from autoleagueplay.result_table import NO_DIVISION, ResultTable
 from autoleagueplay.versioned_bot import VersionedBot
 
 
@@ -40,10 +54,18 @@ class WorkingDir:
         self.match_results = self._working_dir / f'results'
         self.results_overview = self._working_dir / f'results_overview.txt'
         self.versioned_results = self._working_dir / f'versioned_results'
+        self.versioned_results_index = self._working_dir / 'versioned_results.sqlite'
         self.bots = working_dir / 'bots'
+        self.bot_registry_cache = working_dir / 'bot_registry.json'
         self.overlay_interface = working_dir / 'current_match.json'
+        self.overlay_ack = working_dir / 'current_match_ack'
         self.leaderboard = working_dir / 'leaderboard.png'
         self.leaderboard_clip = working_dir / 'leaderboard.mp4'
+        self.trace = working_dir / 'trace.jsonl'
+        self.sort_journal = working_dir / 'sort_journal.jsonl'
+        self.replay_uploads = working_dir / 'replay_uploads.json'
+        self.replay_archive = working_dir / 'replays'
+        self._result_store = None
         self._ensure_directory_structure()
 
     def _ensure_directory_structure(self):
@@ -53,9 +75,19 @@ class WorkingDir:
         self.bots.mkdir(exist_ok=True)
 
     def get_match_result(self, division_index: int, blue: str, orange: str) -> Path:
-        match_name = f'{Ladder.DIVISION_NAMES[division_index].lower()}_{blue}_vs_{orange}.json'
+        match_name = f'{division_key(division_index)}_{blue}_vs_{orange}.json'
         return self.match_results / match_name
 
+    def read_session_results(self) -> ResultTable:
+        """
+        Reads all results in the results directory into a table. The division of each result is found from the
+        beginning of its file name, see get_match_result.
+        """
+        paths = sorted(self.match_results.glob('*.json'))
+        divisions = [division_index_from_key(path.name.partition('_')[0]) for path in paths]
+        divisions = [index if index is not None else NO_DIVISION for index in divisions]
+        return ResultTable.read(paths, divisions)
+
     def get_version_specific_match_result(self, bot1: VersionedBot, bot2: VersionedBot) -> Path:
         return self._get_version_specific_match_result_from_keys(bot1.get_key(), bot2.get_key())
 
@@ -70,20 +102,50 @@ class WorkingDir:
         match_name = MatchHistory.make_result_file_name(key1, key2, datetime.now())
         return self.versioned_results / match_name
 
+    @property
+    def result_store(self) -> ResultStore:
+        """
+        The index over the versioned results. It is opened on first use, which also imports any result files that
+        have not been indexed yet.
+        """
+        if self._result_store is None:
+            self._result_store = ResultStore(self.versioned_results_index, self.versioned_results)
+        return self._result_store
+
     def get_version_specific_match_files(self, key1: str, key2: str) -> List[Path]:
         """
         Returns the match history between these two specific bot versions. The list of match results will be
         returned with the most recent match appearing first.
         """
-        prefix = MatchHistory.make_result_file_prefix(key1, key2)
-        files = list(self.versioned_results.glob(f'{prefix}*'))
-        files.sort(reverse=True)
-        return files
+        return [self.versioned_results / name for name in self.result_store.get_file_names(key1, key2)]
+
+    def get_match_history(self, key1: str, key2: str) -> MatchHistory:
+        """
+        Returns the match history between these two specific bot versions without reading the result files.
+        """
+        return MatchHistory(self.result_store.get_results(key1, key2))
+
+    def get_head_to_head(self, key1: str, key2: str) -> Optional[HeadToHead]:
+        """
+        Returns the current streak, latest result and win counts between these two specific bot versions, or None if
+        they have never played. This is answered from memory once the first head to head has been looked up.
+        """
+        return self.result_store.get_head_to_head(key1, key2)
+
+    def write_version_specific_match_result(self, result: MatchResult, path: Path):
+        """
+        Writes a result to the versioned results directory and adds it to the index.
+        """
+        self.result_store.write(result, path)
+
+    def get_bot_registry(self) -> BotRegistry:
+        return BotRegistry(self.bot_registry_cache, self._working_dir, self.bots)
 
-    def get_bots(self) -> Mapping[str, BotConfigBundle]:
+    def get_bots(self) -> Mapping[str, LazyBotConfig]:
         return {
             bot_config.name: bot_config
-            for bot_config in scan_directory_for_bot_configs(self.bots)
+            for entry in self.get_bot_registry().load().values()
+            for bot_config in entry.bots
         }
 
 
@@ -0,0 +1,142 @@
+"""
+Moves replays out of Rocket League's Demos folder and into the working directory, where they are stored gzipped and
+named by the sha256 hash of their content. Match results record the hash of their replay, so the replay of any result
+can be found, and the Demos folder doesn't keep growing over a season. The archive is pruned to stay within a maximum
+age and size, except for replays that are still waiting to be uploaded.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from autoleagueplay.replay_upload import pending_uploads
+
+ARCHIVE_SUFFIX = '.replay.gz'
+
+
+class ReplayArchive:
+    """
+    A content-addressed store of gzipped replays. A replay with hash h is stored at <directory>/h[:2]/h.replay.gz.
+    """
+
+    def __init__(self, directory: Path, max_age_days: Optional[float] = 90, max_megabytes: Optional[float] = 4096,
+                 settle_seconds: float = 1.0, settle_timeout: float = 15.0):
+        """
+        :param max_age_days: Replays older than this are deleted. None to keep replays regardless of age.
+        :param max_megabytes: The oldest replays are deleted when the archive grows larger than this. None for no limit.
+        :param settle_seconds: A replay is only archived once it hasn't been modified for this long, since the game
+        may still be writing it when the match ends.
+        """
+        self.directory = directory
+        self.max_age_days = max_age_days
+        self.max_megabytes = max_megabytes
+        self.settle_seconds = settle_seconds
+        self.settle_timeout = settle_timeout
+        self._lock = threading.Lock()
+        self.directory.mkdir(exist_ok=True)
+        # The (mtime, size) of every archived replay, oldest first, so pruning never has to list the directory
+        stats = sorted(((path.stat(), path) for path in self.directory.glob(f'*/*{ARCHIVE_SUFFIX}')),
+                       key=lambda item: item[0].st_mtime)
+        self._entries: Dict[Path, Tuple[float, int]] = OrderedDict(
+            (path, (stat.st_mtime, stat.st_size)) for stat, path in stats)
+        self._total_bytes = sum(size for _, size in self._entries.values())
+        self.prune()
+
+    def path_of(self, replay_hash: str) -> Path:
+        return self.directory / replay_hash[:2] / f'{replay_hash}{ARCHIVE_SUFFIX}'
+
+    def store(self, replay_path: Path) -> str:
+        """
+        Moves the replay into the archive and returns its hash. Blocks until the game has finished writing the replay.
+        """
+        self._wait_until_settled(replay_path)
+        with open(replay_path, 'rb') as f:
+            data = f.read()
+        replay_hash = hashlib.sha256(data).hexdigest()
+        archived_path = self.path_of(replay_hash)
+
+        with self._lock:
+            if archived_path in self._entries:
+                # The same replay again. It is as new as the result that refers to it now, so it must not be pruned
+                # before replays that were archived after its first copy.
+                os.utime(str(archived_path))
+                _, size = self._entries.pop(archived_path)
+            else:
+                archived_path.parent.mkdir(exist_ok=True)
+                temp_path = archived_path.with_name(archived_path.name + '.tmp')
+                with gzip.open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(str(temp_path), str(archived_path))
+                size = archived_path.stat().st_size
+                self._total_bytes += size
+            self._entries[archived_path] = (time.time(), size)
+            replay_path.unlink()
+            self._prune()
+        return replay_hash
+
+    def open(self, replay_hash: str):
+        """
+        Returns the replay as a readable binary file with the original, uncompressed content.
+        """
+        return gzip.open(self.path_of(replay_hash), 'rb')
+
+    def extract(self, replay_hash: str, destination: Path):
+        with self.open(replay_hash) as src, open(destination, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+    def prune(self):
+        with self._lock:
+            self._prune()
+
+    def _prune(self):
+        oldest_allowed = time.time() - self.max_age_days * 24 * 60 * 60 if self.max_age_days is not None else None
+        max_bytes = self.max_megabytes * 1024 * 1024 if self.max_megabytes is not None else None
+        waiting_for_upload = None
+        for path, (mtime, size) in list(self._entries.items()):
+            too_old = oldest_allowed is not None and mtime < oldest_allowed
+            too_large = max_bytes is not None and self._total_bytes > max_bytes
+            if not too_old and not too_large:
+                break
+            if waiting_for_upload is None:
+                waiting_for_upload = pending_uploads()
+            if str(path) in waiting_for_upload:
+                continue
+            del self._entries[path]
+            self._total_bytes -= size
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _wait_until_settled(self, replay_path: Path):
+        deadline = time.time() + self.settle_timeout
+        while time.time() < deadline:
+            modified_ago = time.time() - replay_path.stat().st_mtime
+            if modified_ago >= self.settle_seconds:
+                return
+            time.sleep(self.settle_seconds - modified_ago)
+
+
+_archive: Optional[ReplayArchive] = None
+
+
+def start_replay_archive(directory: Path, **kwargs) -> ReplayArchive:
+    """
+    Sets up the archive used for the replays of all matches in this process.
+    """
+    global _archive
+    if _archive is None:
+        _archive = ReplayArchive(directory, **kwargs)
+    return _archive
+
+
+def get_replay_archive() -> Optional[ReplayArchive]:
+    """
+    Returns the archive of this process, or None if replays are left in the Demos folder.
+    """
+    return _archive
@@ -0,0 +1,247 @@
+"""
+Uploads replays to calculated.gg in the background, so a slow or failing upload never holds up detecting the replay
+or grading the match. The state of every replay the uploader has seen is kept in a status file, which doubles as the
+queue: replays that were still waiting to be uploaded when autoleagueplay stopped are uploaded the next time it starts.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+import requests
+
+CALCULATED_GG_UPLOAD_URL = 'https://calculated.gg/api/upload'
+
+PENDING = 'pending'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ReplayUploader:
+    """
+    Uploads queued replays with a few worker threads. Each replay is identified by its file name, so queueing the same
+    replay again does nothing. Failed uploads are retried with exponentially growing delays until max_attempts is
+    reached, after which the replay is marked as failed in the status file.
+    """
+
+    def __init__(self, status_path: Path, upload_url: str = CALCULATED_GG_UPLOAD_URL, max_concurrent: int = 2,
+                 max_attempts: int = 6, retry_delay: float = 10.0, max_retry_delay: float = 600.0,
+                 settle_seconds: float = 2.0, timeout: float = 120.0):
+        """
+        :param status_path: The json file with the state of each replay.
+        :param upload_url: Where replays are posted to. Can point to a local server for testing.
+        :param max_concurrent: The most uploads that run at the same time.
+        :param retry_delay: Seconds to wait before the first retry. The delay doubles with each failed attempt.
+        :param settle_seconds: Replays are only uploaded once they haven't been modified for this long, since the
+        game is still writing them when they are first detected.
+        """
+        self.status_path = status_path
+        self.upload_url = upload_url
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.settle_seconds = settle_seconds
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self.entries: Dict[str, Dict[str, Any]] = self._read_status()
+        for entry in self.entries.values():
+            # Uploads that were running when we stopped last time have to start over
+            if entry['state'] == UPLOADING:
+                entry['state'] = PENDING
+
+    def start(self):
+        for i in range(self.max_concurrent):
+            thread = threading.Thread(target=self._work, name=f'replay-upload-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stops the worker threads. Replays that haven't been uploaded yet stay in the status file.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, replay_path: Path) -> bool:
+        """
+        Queues the replay for upload and returns immediately. Returns false if the replay has been queued before.
+        """
+        replay_name = replay_path.name
+        with self._condition:
+            if replay_name in self.entries:
+                return False
+            self.entries[replay_name] = {
+                'path': str(replay_path),
+                'state': PENDING,
+                'attempts': 0,
+                'next_attempt': 0.0,
+                'error': None,
+            }
+            self._write_status()
+            self._condition.notify()
+        return True
+
+    def pending_paths(self) -> Set[str]:
+        """
+        Returns the paths of the replays that are queued or being uploaded.
+        """
+        with self._condition:
+            return set(entry['path'] for entry in self.entries.values() if entry['state'] in (PENDING, UPLOADING))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until no replays are waiting to be uploaded, or until the timeout. Returns true if all are done.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            while any(entry['state'] in (PENDING, UPLOADING) for entry in self.entries.values()):
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _work(self):
+        while True:
+            with self._condition:
+                replay_name = self._take_next()
+                while replay_name is None:
+                    if self._stopping:
+                        return
+                    self._condition.wait(self._seconds_until_next())
+                    replay_name = self._take_next()
+                entry = self.entries[replay_name]
+                replay_path = Path(entry['path'])
+
+            error = self._upload(replay_path)
+
+            with self._condition:
+                entry['attempts'] += 1
+                if error is None:
+                    entry['state'] = DONE
+                    entry['error'] = None
+                    print(f'Uploaded replay {replay_name}')
+                elif entry['attempts'] >= self.max_attempts or not replay_path.exists():
+                    entry['state'] = FAILED
+                    entry['error'] = error
+                    print(f'Giving up on uploading replay {replay_name}: {error}')
+                else:
+                    delay = min(self.retry_delay * 2 ** (entry['attempts'] - 1), self.max_retry_delay)
+                    entry['state'] = PENDING
+                    entry['error'] = error
+                    entry['next_attempt'] = time.time() + delay
+                    print(f'Upload of replay {replay_name} failed, retrying in {delay:.0f} seconds: {error}')
+                self._write_status()
+                self._condition.notify_all()
+
+    def _take_next(self) -> Optional[str]:
+        """
+        Returns the name of a replay that is due to be uploaded and marks it as uploading. Must hold the condition.
+        """
+        now = time.time()
+        for replay_name, entry in self.entries.items():
+            if entry['state'] != PENDING or entry['next_attempt'] > now:
+                continue
+            replay_path = Path(entry['path'])
+            if replay_path.exists():
+                settled_at = replay_path.stat().st_mtime + self.settle_seconds
+                if settled_at > now:
+                    # The game is probably still writing the replay
+                    entry['next_attempt'] = settled_at
+                    continue
+            entry['state'] = UPLOADING
+            return replay_name
+        return None
+
+    def _seconds_until_next(self) -> Optional[float]:
+        due = [entry['next_attempt'] for entry in self.entries.values() if entry['state'] == PENDING]
+        if len(due) == 0:
+            return None
+        return max(min(due) - time.time(), 0.01)
+
+    def _upload(self, replay_path: Path) -> Optional[str]:
+        """
+        Uploads the replay. Returns None if it went well, or a description of the error.
+        """
+        try:
+            if replay_path.suffix == '.gz':
+                # Replays in the replay archive are compressed
+                with gzip.open(replay_path, 'rb') as f:
+                    files = {'replays': (replay_path.stem, f.read())}
+            else:
+                with open(replay_path, 'rb') as f:
+                    files = {'replays': (replay_path.name, f.read())}
+            response = requests.post(self.upload_url, files=files, timeout=self.timeout)
+            if not response.ok:
+                return f'HTTP {response.status_code}'
+            return None
+        except (OSError, requests.RequestException) as e:
+            return str(e)
+
+    def _read_status(self) -> Dict[str, Dict[str, Any]]:
+        if not self.status_path.exists():
+            return {}
+        try:
+            with open(self.status_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Could not read {self.status_path}, starting with an empty upload queue: {e}')
+            return {}
+
+    def _write_status(self):
+        temp_path = self.status_path.with_name(self.status_path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f, indent=4)
+        os.replace(str(temp_path), str(self.status_path))
+
+
+_uploader: Optional[ReplayUploader] = None
+_uploader_lock = threading.Lock()
+
+
+def start_replay_uploads(status_path: Path, **kwargs) -> ReplayUploader:
+    """
+    Starts the uploader shared by all matches in this process, or returns it if it has been started already.
+    Replays left in the status file by an earlier run are uploaded too.
+    """
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = ReplayUploader(status_path, **kwargs)
+            _uploader.start()
+        return _uploader
+
+
+def get_replay_uploader() -> Optional[ReplayUploader]:
+    """
+    Returns the uploader of this process, or None if start_replay_uploads hasn't been called.
+    """
+    return _uploader
+
+
+def pending_uploads() -> Set[str]:
+    """
+    Returns the paths of the replays that this process's uploader still has to upload.
+    """
+    return _uploader.pending_paths() if _uploader is not None else set()
+
+
+def upload_replay(replay_path: Path):
+    """
+    Queues the replay for upload to calculated.gg without waiting for the upload. The uploader must have been started
+    with start_replay_uploads, which decides where the queue is kept.
+    """
+    if _uploader is None:
+        raise RuntimeError('Replays can only be uploaded after start_replay_uploads has been called')
+    _uploader.enqueue(replay_path)
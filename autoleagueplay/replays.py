@@ -1,13 +1,19 @@
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Deque, List, Optional
 
-import requests
 from rlbottraining.history.metric import Metric
-from watchdog.events import LoggingEventHandler
+from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replay_archive import get_replay_archive
+from autoleagueplay.replay_upload import start_replay_uploads, upload_replay
+
 
 class ReplayPreference(Enum):
     SAVE = 'save'  # save to the default replays directory
@@ -15,10 +21,13 @@ class ReplayPreference(Enum):
     IGNORE_REPLAY = 'ignore'
 
 
-def upload_to_calculated_gg(replay_path: Path):
-    with open(replay_path, 'rb') as f:
-        response = requests.post('https://calculated.gg/api/upload', files={'replays': f})
-        print(f'upload response to {replay_path.name}: {response}')
+def prepare_replay_uploads(working_dir: WorkingDir, replay_preference: ReplayPreference):
+    """
+    Starts the uploader with the working directory's upload queue if the replays should go to calculated.gg.
+    Must be called before the first match is played, since a match whose replay can't be queued is wasted.
+    """
+    if replay_preference == ReplayPreference.CALCULATED_GG:
+        start_replay_uploads(working_dir.replay_uploads)
 
 
 def parse_replay_id(replay_path: Path) -> str:
@@ -27,13 +36,122 @@ def parse_replay_id(replay_path: Path) -> str:
     return replay_id
 
 
-@dataclass
+class DetectedReplay:
+    """
+    A replay file noticed by the ReplayWatcher.
+    """
+
+    def __init__(self, path: Path, created_at: float):
+        self.path = path
+        self.replay_id = parse_replay_id(path)
+        self.created_at = created_at  # time.time() timestamp
+        self.monitor: Optional['ReplayMonitor'] = None  # The match the replay was given to, if any
+
+
+class ReplayWatcher:
+    """
+    Watches the replay directory for the rest of the process and hands new replays to the match that is being played.
+    A replay belongs to the most recently started match that began before the replay was created and doesn't have a
+    replay yet. The most recent replays are kept in memory, so a replay that is written just before its match starts
+    being monitored is still found.
+    """
+
+    def __init__(self, replay_dir: Path, recent_replays: int = 32):
+        self.replay_dir = replay_dir
+        self.recent: Deque[DetectedReplay] = deque(maxlen=recent_replays)
+        self._active: List['ReplayMonitor'] = []
+        self._lock = threading.Lock()
+        self._observer: Optional[Observer] = None
+
+    def start(self):
+        watcher = self
+
+        class OnReplayWritten(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.on_replay_written(Path(event.src_path))
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.on_replay_written(Path(event.src_path))
+
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(OnReplayWritten(), str(self.replay_dir), recursive=True)
+        self._observer.start()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(1)
+            self._observer = None
+
+    def on_replay_written(self, replay_path: Path):
+        if replay_path.suffix != '.replay':
+            return
+        with self._lock:
+            # The game writes a replay in several steps, but only the first event is interesting
+            if any(replay.path == replay_path for replay in self.recent):
+                return
+            try:
+                stat = replay_path.stat()
+                created_at = getattr(stat, 'st_birthtime', stat.st_ctime)
+            except OSError:
+                created_at = time.time()
+            replay = DetectedReplay(replay_path, created_at)
+            self.recent.append(replay)
+            candidates = [monitor for monitor in self._active if monitor.started_at <= replay.created_at]
+            if len(candidates) > 0:
+                self._give(replay, max(candidates, key=lambda monitor: monitor.started_at))
+
+    def add(self, monitor: 'ReplayMonitor'):
+        """
+        Starts looking for the replay of the monitor's match. The match is assumed to have started at
+        monitor.started_at, so a replay created after that which nobody else has claimed is given to it right away.
+        """
+        with self._lock:
+            self._active.append(monitor)
+            for replay in self.recent:
+                if replay.monitor is None and replay.created_at >= monitor.started_at:
+                    self._give(replay, monitor)
+                    break
+
+    def remove(self, monitor: 'ReplayMonitor'):
+        with self._lock:
+            if monitor in self._active:
+                self._active.remove(monitor)
+
+    def _give(self, replay: DetectedReplay, monitor: 'ReplayMonitor'):
+        replay.monitor = monitor
+        self._active.remove(monitor)
+        monitor.replay_path = replay.path
+        monitor.replay_id = replay.replay_id
+
+
+_watcher: Optional[ReplayWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_replay_watcher() -> ReplayWatcher:
+    """
+    Returns the replay watcher shared by all matches in this process. It is started the first time it is needed.
+    """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = ReplayWatcher(get_replay_dir())
+            _watcher.start()
+        return _watcher
+
+
+@dataclass(eq=False)  # The watcher tells monitors apart by identity
 class ReplayMonitor(Metric):
 
     replay_preference: ReplayPreference
 
     replay_id: str = None
-    observer: Observer = None
+    replay_path: Optional[Path] = None
+    started_at: Optional[float] = None  # time.time() timestamp of when monitoring began
 
     def to_json(self) -> Dict[str, Any]:
         return {
@@ -41,35 +159,35 @@ class ReplayMonitor(Metric):
         }
 
     def ensure_monitoring(self):
-        if self.replay_preference == ReplayPreference.IGNORE_REPLAY or self.observer is not None:
+        if self.replay_preference == ReplayPreference.IGNORE_REPLAY or self.started_at is not None:
             return
-        replay_monitor = self
-        class SetReplayId(LoggingEventHandler):
-            def on_modified(set_replay_id_self, event):
-                if event.is_directory: return
-                assert event.src_path.endswith('.replay')
-                nonlocal replay_monitor
-                replay_path = Path(event.src_path)
-                if replay_monitor.replay_preference == ReplayPreference.CALCULATED_GG:
-                    upload_to_calculated_gg(replay_path)
-                replay_monitor.replay_id = parse_replay_id(replay_path)
-
-            def on_created(self, event):
-                pass
-            def on_deleted(self, event):
-                pass
-            def on_moved(self, event):
-                pass
-
-        self.observer = Observer()
-        self.observer.daemon = True
-        self.observer.schedule(SetReplayId(), str(get_replay_dir()), recursive=True)
-        self.observer.start()
+        self.started_at = time.time()
+        get_replay_watcher().add(self)
 
     def stop_monitoring(self):
-        if self.observer is not None:
-            self.observer.stop()
-            self.observer.join(1)
+        if self.started_at is not None and _watcher is not None:
+            _watcher.remove(self)
+
+    def file_replay(self) -> Optional[str]:
+        """
+        Moves the replay of the match into the replay archive, if one has been started, and queues it for upload if
+        the replays should go to calculated.gg. Returns the hash of the archived replay.
+        """
+        if self.replay_path is None:
+            return None
+        replay_path = self.replay_path
+        replay_hash = None
+        archive = get_replay_archive()
+        if archive is not None:
+            try:
+                replay_hash = archive.store(replay_path)
+                replay_path = archive.path_of(replay_hash)
+            except OSError as e:
+                print(f'Could not archive replay {replay_path.name}: {e}')
+        if self.replay_preference == ReplayPreference.CALCULATED_GG:
+            # Only queues the replay, the upload happens in the background
+            upload_replay(replay_path)
+        return replay_hash
 
 
 def get_replay_dir() -> Path:
@@ -0,0 +1,253 @@
+"""
+An indexed store of versioned match results. The json files in versioned_results/ remain the source of truth, but
+looking up the history between two specific bot versions is answered by a SQLite index instead of globbing the
+directory and parsing every matching file. The index also keeps a head to head summary of each pair up to date, which
+is all that is needed to decide whether a match is a stale rematch.
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from autoleagueplay.match_history import HeadToHead, MatchHistory
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.result_table import ResultTable
+
+RESULT_COLUMNS = ('blue', 'orange', 'blue_goals', 'orange_goals', 'blue_shots', 'orange_shots',
+                  'blue_saves', 'orange_saves', 'blue_points', 'orange_points')
+_RESULT_COLUMN_DEFINITIONS = ', '.join(
+    f'{column} TEXT NOT NULL' if column in ('blue', 'orange') else f'{column} INTEGER NOT NULL'
+    for column in RESULT_COLUMNS)
+
+# Bump this to rebuild the head_to_head table from the results when the store is opened
+HEAD_TO_HEAD_VERSION = '1'
+# Bump this to drop the whole index and import the json files again when the store is opened, e.g. if columns change
+INDEX_VERSION = '2'
+
+
+class ResultStore:
+    """
+    SQLite index over the versioned_results/ directory. Each row is keyed by the versioned bot pair (the file name
+    prefix created by MatchHistory.make_result_file_prefix) and the time the match was played.
+    Existing json files are imported the first time the store is opened. Whenever the store is opened after that,
+    the index is brought up to date with results that were changed by something other than the store itself, e.g.
+    result files that were copied in, fixed or deleted by hand, or changed by a git pull.
+    Every inserted result also updates the head to head summary of its pair, see HeadToHead.
+    """
+
+    def __init__(self, db_path: Path, results_dir: Path):
+        self.db_path = db_path
+        self.results_dir = results_dir
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._head_to_heads = None  # All head to heads by pair, loaded on first use
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        if self._get_meta('index_version') != INDEX_VERSION:
+            self._connection.executescript('''
+                DROP TABLE IF EXISTS results;
+                DROP TABLE IF EXISTS head_to_head;
+                DELETE FROM meta;
+            ''')
+            self._set_meta('index_version', INDEX_VERSION)
+        self._connection.executescript(f'''
+            CREATE TABLE IF NOT EXISTS results (
+                file_name TEXT PRIMARY KEY,
+                pair TEXT NOT NULL,
+                played_at TEXT NOT NULL,
+                file_mtime INTEGER NOT NULL,
+                file_size INTEGER NOT NULL,
+                {_RESULT_COLUMN_DEFINITIONS}
+            );
+            CREATE INDEX IF NOT EXISTS results_by_pair ON results (pair, played_at);
+            CREATE TABLE IF NOT EXISTS head_to_head (
+                pair TEXT PRIMARY KEY,
+                latest_file TEXT NOT NULL,
+                streak INTEGER NOT NULL,
+                bot1 TEXT NOT NULL,
+                wins1 INTEGER NOT NULL,
+                bot2 TEXT NOT NULL,
+                wins2 INTEGER NOT NULL
+            );
+        ''')
+        self._connection.commit()
+        if self._get_meta('head_to_head_version') != HEAD_TO_HEAD_VERSION:
+            self._rebuild_head_to_heads()
+        self.sync()
+
+    def sync(self) -> int:
+        """
+        Brings the index up to date with the json result files: new files are imported, files whose modification time
+        or size changed are imported again, and files that are gone are removed from the index. Every file is checked,
+        since editing a file in place doesn't change the modification time of the directory. Only the changed files
+        are parsed. Returns the number of imported results.
+        """
+        with self._lock:
+            known = {file_name: (file_mtime, file_size) for file_name, file_mtime, file_size
+                     in self._connection.execute('SELECT file_name, file_mtime, file_size FROM results')}
+            seen = set()
+            imported = 0
+            for entry in os.scandir(self.results_dir):
+                if not entry.name.endswith('.json'):
+                    continue
+                stat = entry.stat()
+                if known.get(entry.name) == (stat.st_mtime_ns, stat.st_size):
+                    seen.add(entry.name)
+                    continue
+                try:
+                    result = MatchResult.read(Path(entry.path))
+                except Exception as e:
+                    # If the file was indexed before, it isn't seen, so its old result is removed below
+                    print(f'Skipping result {entry.name} while indexing: {e}')
+                    continue
+                seen.add(entry.name)
+                self._insert(entry.name, result, stat)
+                imported += 1
+            removed = [file_name for file_name in known if file_name not in seen]
+            for file_name in removed:
+                self._connection.execute('DELETE FROM results WHERE file_name = ?', (file_name,))
+            for pair in set(split_result_file_name(file_name)[0] for file_name in removed):
+                self._rebuild_head_to_heads(pair)
+            self._connection.commit()
+        if imported > 0:
+            print(f'Indexed {imported} versioned results')
+        if len(removed) > 0:
+            print(f'Removed {len(removed)} versioned results from the index')
+        return imported
+
+    def write(self, result: MatchResult, path: Path):
+        """
+        Writes the result to the given path in the versioned results directory and adds it to the index.
+        """
+        result.write(path)
+        with self._lock:
+            self._insert(path.name, result, os.stat(path))
+            self._connection.commit()
+
+    def get_file_names(self, key1: str, key2: str) -> List[str]:
+        """
+        Returns the file names of the results between these two specific bot versions, most recent first.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT file_name FROM results WHERE pair = ? ORDER BY file_name DESC',
+                (MatchHistory.make_result_file_prefix(key1, key2),)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_results(self, key1: str, key2: str) -> ResultTable:
+        """
+        Returns the results between these two specific bot versions, most recent first.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f'SELECT {", ".join(RESULT_COLUMNS)} FROM results WHERE pair = ? ORDER BY file_name DESC',
+                (MatchHistory.make_result_file_prefix(key1, key2),)).fetchall()
+        return ResultTable.from_rows(rows)
+
+    def get_head_to_head(self, key1: str, key2: str) -> Optional[HeadToHead]:
+        """
+        Returns the head to head summary of the results between these two specific bot versions, or None if they
+        have never played. The first call reads the summaries of all pairs, so later calls don't touch the database.
+        """
+        with self._lock:
+            if self._head_to_heads is None:
+                rows = self._connection.execute(
+                    f'SELECT h.pair, h.streak, h.bot1, h.wins1, h.bot2, h.wins2, '
+                    f'{", ".join("r." + column for column in RESULT_COLUMNS)} '
+                    f'FROM head_to_head h JOIN results r ON r.file_name = h.latest_file').fetchall()
+                self._head_to_heads = {
+                    pair: HeadToHead(MatchResult(*result), streak, {bot1: wins1, bot2: wins2})
+                    for pair, streak, bot1, wins1, bot2, wins2, *result in rows
+                }
+            return self._head_to_heads.get(MatchHistory.make_result_file_prefix(key1, key2))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _insert(self, file_name: str, result: MatchResult, stat: os.stat_result):
+        pair, played_at = split_result_file_name(file_name)
+        replaced = self._connection.execute(
+            'SELECT 1 FROM results WHERE file_name = ?', (file_name,)).fetchone() is not None
+        self._connection.execute(
+            f'INSERT OR REPLACE INTO results (file_name, pair, played_at, file_mtime, file_size, '
+            f'{", ".join(RESULT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in RESULT_COLUMNS)})',
+            (file_name, pair, played_at, stat.st_mtime_ns, stat.st_size,
+             *(getattr(result, column) for column in RESULT_COLUMNS)))
+        if replaced:
+            # The previous version of the result is already counted in the head to head
+            self._rebuild_head_to_heads(pair)
+        else:
+            self._update_head_to_head(pair, file_name, result)
+
+    def _update_head_to_head(self, pair: str, file_name: str, result: MatchResult):
+        row = self._connection.execute(
+            f'SELECT h.latest_file, h.streak, h.bot1, h.wins1, h.bot2, h.wins2, '
+            f'{", ".join("r." + column for column in RESULT_COLUMNS)} '
+            f'FROM head_to_head h JOIN results r ON r.file_name = h.latest_file WHERE h.pair = ?', (pair,)).fetchone()
+        if row is None:
+            self._write_head_to_head(pair, file_name, HeadToHead.first(result))
+        elif row[0] < file_name:
+            latest_file, streak, bot1, wins1, bot2, wins2, *latest_result = row
+            head_to_head = HeadToHead(MatchResult(*latest_result), streak, {bot1: wins1, bot2: wins2})
+            self._write_head_to_head(pair, file_name, head_to_head.after(result))
+        else:
+            # The result is older than the latest one, e.g. because it was copied in by hand, or it replaced an
+            # existing result. Either way the streak can't be updated incrementally.
+            self._rebuild_head_to_heads(pair)
+
+    def _rebuild_head_to_heads(self, pair: Optional[str] = None):
+        """
+        Recomputes the head to head summaries of the given pair, or of all pairs, from the results.
+        """
+        where = 'WHERE pair = ?' if pair is not None else ''
+        rows = self._connection.execute(
+            f'SELECT pair, file_name, {", ".join(RESULT_COLUMNS)} FROM results {where} ORDER BY pair, file_name',
+            (pair,) if pair is not None else ()).fetchall()
+        self._connection.execute(f'DELETE FROM head_to_head {where}', (pair,) if pair is not None else ())
+        if self._head_to_heads is not None:
+            if pair is None:
+                self._head_to_heads.clear()
+            else:
+                # The pair has no results left if all of them were removed
+                self._head_to_heads.pop(pair, None)
+        head_to_heads: Dict[str, Tuple[str, HeadToHead]] = {}
+        for row_pair, row_file_name, *row_result in rows:
+            result = MatchResult(*row_result)
+            previous = head_to_heads.get(row_pair)
+            head_to_head = previous[1].after(result) if previous is not None else HeadToHead.first(result)
+            head_to_heads[row_pair] = (row_file_name, head_to_head)
+        for row_pair, (latest_file, head_to_head) in head_to_heads.items():
+            self._write_head_to_head(row_pair, latest_file, head_to_head)
+        self._set_meta('head_to_head_version', HEAD_TO_HEAD_VERSION)
+        self._connection.commit()
+
+    def _write_head_to_head(self, pair: str, latest_file: str, head_to_head: HeadToHead):
+        # A pair always has two bots, unless a bot somehow played itself
+        win_counts = sorted(head_to_head.win_counts.items())
+        (bot1, wins1), (bot2, wins2) = (win_counts + win_counts)[:2]
+        self._connection.execute(
+            'INSERT OR REPLACE INTO head_to_head (pair, latest_file, streak, bot1, wins1, bot2, wins2) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (pair, latest_file, head_to_head.streak, bot1, wins1, bot2, wins2))
+        if self._head_to_heads is not None:
+            self._head_to_heads[pair] = head_to_head
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_meta(self, key: str, value: str):
+        self._connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+
+def split_result_file_name(file_name: str):
+    """
+    Splits a versioned result file name into the pair prefix and the time stamp, i.e. the inverse of
+    MatchHistory.make_result_file_name.
+    """
+    stem = file_name[:-len('.json')] if file_name.endswith('.json') else file_name
+    pair, _, played_at = stem.rpartition('_at_')
+    if not pair:
+        return stem, ''
+    return pair, played_at
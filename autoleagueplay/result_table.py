@@ -0,0 +1,145 @@
+"""
+A compact in-memory representation of many match results. Instead of an object per result, the bot names are interned
+and every stat is stored in a column of a numpy array, so histories and score tables can be computed over whole columns.
+"""
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from autoleagueplay.match_result import MatchResult
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Columns of the stats array, in the same order as the arguments of MatchResult after the bot names
+BLUE_GOALS, ORANGE_GOALS, BLUE_SHOTS, ORANGE_SHOTS, BLUE_SAVES, ORANGE_SAVES, BLUE_POINTS, ORANGE_POINTS = range(8)
+STAT_COLUMNS = ('blue_goals', 'orange_goals', 'blue_shots', 'orange_shots',
+                'blue_saves', 'orange_saves', 'blue_points', 'orange_points')
+
+# Used in the divisions column when the division of a result is unknown
+NO_DIVISION = -1
+
+
+class ResultTable:
+    """
+    Match results stored column by column. Each bot name is stored once in `bots`, and the `blue` and `orange` columns
+    contain indices into that list. Indexing the table with an int returns the result as a MatchResult, while indexing
+    it with a slice or a boolean mask returns a new table with the selected results.
+
+    numpy is imported by the methods that need it, so commands that never build a table don't have to load it.
+    """
+
+    def __init__(self, bots: List[str], blue: 'np.ndarray', orange: 'np.ndarray', stats: 'np.ndarray',
+                 divisions: Optional['np.ndarray'] = None):
+        import numpy as np
+        self.bots = bots
+        self.blue = blue
+        self.orange = orange
+        self.stats = stats
+        self.divisions = divisions if divisions is not None else np.full(len(blue), NO_DIVISION, dtype=np.int32)
+        self._bot_ids = {bot: i for i, bot in enumerate(bots)}
+
+    @staticmethod
+    def from_rows(rows: Iterable[Tuple], divisions: Optional[Iterable[int]] = None) -> 'ResultTable':
+        """
+        Creates a table from rows of (blue, orange, blue_goals, orange_goals, ..., orange_points), i.e. the arguments
+        of MatchResult. These are also the columns of the result store.
+        """
+        import numpy as np
+        bot_ids = {}
+        blue = []
+        orange = []
+        stats = []
+        for row in rows:
+            blue.append(bot_ids.setdefault(row[0], len(bot_ids)))
+            orange.append(bot_ids.setdefault(row[1], len(bot_ids)))
+            stats.append(row[2:])
+        return ResultTable(
+            list(bot_ids),
+            np.array(blue, dtype=np.int32),
+            np.array(orange, dtype=np.int32),
+            np.array(stats, dtype=np.int32).reshape(len(stats), len(STAT_COLUMNS)),
+            np.array(list(divisions), dtype=np.int32) if divisions is not None else None)
+
+    @staticmethod
+    def from_results(results: Iterable[MatchResult], divisions: Optional[Iterable[int]] = None) -> 'ResultTable':
+        return ResultTable.from_rows(
+            ((r.blue, r.orange, *(getattr(r, column) for column in STAT_COLUMNS)) for r in results), divisions)
+
+    @staticmethod
+    def read(paths: Iterable[Path], divisions: Optional[Iterable[int]] = None) -> 'ResultTable':
+        return ResultTable.from_results((MatchResult.read(path) for path in paths), divisions)
+
+    def __len__(self) -> int:
+        return len(self.blue)
+
+    def __getitem__(self, index: Union[int, slice, 'np.ndarray']) -> Union[MatchResult, 'ResultTable']:
+        import numpy as np
+        if isinstance(index, (int, np.integer)):
+            return MatchResult(self.bots[self.blue[index]], self.bots[self.orange[index]],
+                               *(int(value) for value in self.stats[index]))
+        # The selected rows keep using the same interned bot names
+        return ResultTable(self.bots, self.blue[index], self.orange[index], self.stats[index], self.divisions[index])
+
+    def __iter__(self) -> Iterator[MatchResult]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def bot_id(self, bot: str) -> int:
+        """
+        Returns the index of the bot in `bots`, or -1 if the bot is not in the table.
+        """
+        return self._bot_ids.get(bot, -1)
+
+    def bot_ids(self, bots: Sequence[str]) -> 'np.ndarray':
+        """
+        Returns an array which maps the interned bot ids of this table to the bots' positions in the given list.
+        Bots that are not in the list are mapped to -1.
+        """
+        import numpy as np
+        positions = {bot: i for i, bot in enumerate(bots)}
+        return np.array([positions.get(bot, -1) for bot in self.bots], dtype=np.int64)
+
+    def for_bot(self, bot: str) -> 'ResultTable':
+        """
+        Returns the results the bot played in, no matter the color.
+        """
+        bot_id = self.bot_id(bot)
+        return self[(self.blue == bot_id) | (self.orange == bot_id)]
+
+    def between(self, bot1: str, bot2: str) -> 'ResultTable':
+        """
+        Returns the results between the two bots, no matter who was blue.
+        """
+        id1 = self.bot_id(bot1)
+        id2 = self.bot_id(bot2)
+        return self[((self.blue == id1) & (self.orange == id2)) | ((self.blue == id2) & (self.orange == id1))]
+
+    def in_division(self, division_index: int) -> 'ResultTable':
+        return self[self.divisions == division_index]
+
+    @property
+    def winner_ids(self) -> 'np.ndarray':
+        """
+        The interned id of the winner of each result. Like MatchResult.winner, orange wins if the goals are equal.
+        """
+        import numpy as np
+        return np.where(self.stats[:, BLUE_GOALS] > self.stats[:, ORANGE_GOALS], self.blue, self.orange)
+
+    def win_counts(self, bots: Sequence[str]) -> Dict[str, int]:
+        """
+        Returns the number of results each of the given bots won.
+        """
+        import numpy as np
+        counts = np.bincount(self.winner_ids, minlength=len(self.bots))
+        return {bot: int(counts[self.bot_id(bot)]) if self.bot_id(bot) >= 0 else 0 for bot in bots}
+
+    def streak_length(self) -> int:
+        """
+        Returns how many results in a row from the start of the table have the same winner as the first result.
+        """
+        import numpy as np
+        winners = self.winner_ids
+        if len(winners) == 0:
+            return 0
+        other_winners = np.flatnonzero(winners != winners[0])
+        return int(other_winners[0]) if len(other_winners) > 0 else len(winners)
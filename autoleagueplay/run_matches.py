@@ -1,56 +1,145 @@
+import threading
 import time
-from pathlib import Path
+from typing import List, Optional, Tuple
 
-from rlbot.setup_manager import setup_manager_context
-from rlbot.training.training import Fail
+from rlbot.matchconfig.match_config import MatchConfig
+from rlbot.setup_manager import SetupManager, setup_manager_context
+from rlbot.training.training import Result
 from rlbot.utils.logging_utils import get_logger
+from rlbot.utils.structures.game_interface import GameInterface
 from rlbottraining.exercise_runner import run_playlist, RenderPolicy
 
+from autoleagueplay.division_scheduler import DivisionScheduler, RoundRobinRange, build_round_robin_graph
+from autoleagueplay.divisions import division_name
 from autoleagueplay.generate_matches import generate_round_robin_matches
 from autoleagueplay.ladder import Ladder, RunStrategy
 from autoleagueplay.load_bots import load_all_bots_versioned
 from autoleagueplay.match_configurations import make_match_config
-from autoleagueplay.match_exercise import MatchExercise, MatchGrader, MercyRule
-from autoleagueplay.match_history import MatchHistory
-from autoleagueplay.match_result import CombinedScore, MatchResult
+from autoleagueplay.match_backend import MatchBackend
+from autoleagueplay.match_exercise import MatchExercise
+from autoleagueplay.match_pool import MatchJob, MatchPool, MatchWorker, WorkerPool
+from autoleagueplay.match_result import MatchResult
 from autoleagueplay.overlay import OverlayData
+from autoleagueplay.pacing import Pacer
 from autoleagueplay.paths import WorkingDir
-from autoleagueplay.replays import ReplayPreference, ReplayMonitor
-from autoleagueplay.versioned_bot import VersionedBot
+from autoleagueplay.replays import ReplayPreference, prepare_replay_uploads
+from autoleagueplay.scoring import calc_scores, event_seed
+from autoleagueplay.stale_rematches import get_stale_match_result
+from autoleagueplay.timing import phase, timer
 
 logger = get_logger('autoleagueplay')
 
 
-def run_match(participant_1: str, participant_2: str, match_config, replay_preference: ReplayPreference) -> MatchResult:
-    with setup_manager_context() as setup_manager:
+class MatchSession(MatchBackend):
+    """
+    Plays matches in Rocket League. Keeps a setup manager and its connection to the game alive across matches, so only
+    the bots are restarted between matches. If a match fails, the whole session is torn down and started again, and
+    the match is retried once.
+    Usage:
+    >>> with MatchSession() as session:
+    ...     result = session.run_match(...)
+    """
 
-        # Prepare the match exercise
-        print(f'Starting match: {participant_1} vs {participant_2}. Waiting for match to finish...')
-        match = MatchExercise(
-            name=f'{participant_1} vs {participant_2}',
-            match_config=match_config,
-            grader=MatchGrader(
-                mercy_rule=MercyRule(game_interface=setup_manager.game_interface),
-                replay_monitor=ReplayMonitor(replay_preference=replay_preference),
-            )
-        )
+    def __init__(self):
+        self._context = None
+        self.setup_manager: Optional[SetupManager] = None
 
-        # If any bots have signed up for early start, give them 10 seconds.
-        # This is typically enough for Scratch.
-        setup_manager.early_start_seconds = 10
+    def run_match(self, participant_1: str, participant_2: str, match_config,
+                  replay_preference: ReplayPreference) -> MatchResult:
+        try:
+            return super().run_match(participant_1, participant_2, match_config, replay_preference)
+        except Exception as e:
+            print(f'Match \'{participant_1} vs {participant_2}\' failed ({e}). Restarting the game session and '
+                  f'trying again.')
+            self.close()
+            return super().run_match(participant_1, participant_2, match_config, replay_preference)
 
+    def run_exercise(self, exercise: MatchExercise) -> Result:
+        self._ensure_started()
         # For loop, but should only run exactly once
-        for exercise_result in run_playlist([match], setup_manager=setup_manager, render_policy=RenderPolicy.NO_TRAINING_RENDER):
-
-            # Warn users if no replay was found
-            if isinstance(exercise_result.grade, Fail) and exercise_result.exercise.grader.replay_monitor.replay_id == None:
-                print(f'WARNING: No replay was found for the match \'{participant_1} vs {participant_2}\'. Is Bakkesmod injected and \'Automatically save all replays\' enabled?')
+        for exercise_result in run_playlist([exercise], setup_manager=self.setup_manager,
+                                            render_policy=RenderPolicy.NO_TRAINING_RENDER):
+            return exercise_result
+
+    def get_game_interface(self) -> GameInterface:
+        self._ensure_started()
+        return self.setup_manager.game_interface
+
+    def close(self):
+        if self._context is not None:
+            context = self._context
+            self._context = None
+            self.setup_manager = None
+            context.__exit__(None, None, None)
+
+    def _ensure_started(self):
+        if self._context is None:
+            with phase('session start'):
+                context = setup_manager_context()
+                self.setup_manager = context.__enter__()
+                self._context = context
+
+            # If any bots have signed up for early start, give them 10 seconds.
+            # This is typically enough for Scratch.
+            self.setup_manager.early_start_seconds = 10
+
+
+class GameInstanceWorker(MatchWorker):
+    """
+    Plays matches with a match backend, by default in Rocket League. The worker keeps its backend, and so its game
+    session, alive across all the matches it plays, and parses the bot configs of the next match while the current
+    match is still being played.
+    """
 
-            return exercise_result.exercise.grader.match_result
+    def __init__(self, replay_preference: ReplayPreference, pacer: Optional[Pacer] = None,
+                 backend: Optional[MatchBackend] = None):
+        self.replay_preference = replay_preference
+        self.pacer = pacer or Pacer()
+        self.backend = backend or MatchSession()
+        self._prepared_lock = threading.Lock()
+        self._prepared: Optional[Tuple[MatchJob, MatchConfig]] = None
+
+    def prepare(self, job: MatchJob):
+        with self._prepared_lock:
+            if self._prepared is not None and self._prepared[0] is job:
+                return
+        match_config = make_match_config(job.blue.bot_config, job.orange.bot_config, job.team_size)
+        with self._prepared_lock:
+            self._prepared = (job, match_config)
+
+    def play(self, job: MatchJob) -> MatchResult:
+        with self._prepared_lock:
+            prepared, self._prepared = self._prepared, None
+        if prepared is not None and prepared[0] is job:
+            match_config = prepared[1]
+        else:
+            match_config = make_match_config(job.blue.bot_config, job.orange.bot_config, job.team_size)
+        return self.backend.run_match(job.blue.bot_config.name, job.orange.bot_config.name, match_config,
+                                      self.replay_preference)
+
+    def rest(self):
+        # Let the winner celebrate and the scoreboard show for a few seconds.
+        # This pause is not required. The overlay still shows the match start, so an ack of it must not end the pause.
+        self.pacer.pause(8)
+
+    def close(self):
+        self.backend.close()
+
+
+def run_match(participant_1: str, participant_2: str, match_config, replay_preference: ReplayPreference,
+              backend: Optional[MatchBackend] = None) -> MatchResult:
+    """
+    Plays a single match with the given backend, or in a fresh game session if no backend is given.
+    """
+    if backend is not None:
+        return backend.run_match(participant_1, participant_2, match_config, replay_preference)
+    with MatchSession() as session:
+        return session.run_match(participant_1, participant_2, match_config, replay_preference)
 
 
 def run_league_play(working_dir: WorkingDir, run_strategy: RunStrategy, replay_preference: ReplayPreference,
-                    team_size: int, shutdowntime: int, stale_rematch_threshold: int = 0, half_robin: bool = False):
+                    team_size: int, shutdowntime: int, stale_rematch_threshold: int = 0, half_robin: bool = False,
+                    pool: Optional[MatchPool] = None, pacer: Optional[Pacer] = None):
     """
     Run a league play event by running round robins for half the divisions. When done, a new ladder file is created.
 
@@ -59,12 +148,53 @@ def run_league_play(working_dir: WorkingDir, run_strategy: RunStrategy, replay_p
     If 0 is passed, we will not skip anything.
     :param half_robin: If true, we will split the division into an upper and lower round-robin, which reduces the
     number of matches required.
+    :param pool: The pool that plays the matches. The matches of a round robin are independent, so with
+    multiple workers they are played concurrently. By default, a single worker plays the matches in Rocket League.
+    :param pacer: Decides how long to pause to show results on the overlay. By default, the usual pauses are used.
     """
 
+    prepare_replay_uploads(working_dir, replay_preference)
+    if pacer is None:
+        pacer = Pacer.for_working_dir(working_dir)
+    if pool is None:
+        pool = WorkerPool([GameInstanceWorker(replay_preference, pacer)])
+
+    # Time the phases of the event, so it's possible to see where the time went
+    timer.reset()
+    timer.start_trace(working_dir.trace)
+    start = time.perf_counter()
+    try:
+        with pool:
+            return _run_league_play(working_dir, run_strategy, team_size, shutdowntime, stale_rematch_threshold,
+                                    half_robin, pool, pacer)
+    finally:
+        timer.stop_trace()
+        print(timer.match_summary())
+        print()
+        print(timer.summary(time.perf_counter() - start))
+
+
+class RoundRobinState:
+    """
+    The progress of a round robin that has been started.
+    """
+
+    def __init__(self, rr: RoundRobinRange, rr_bots: List[str]):
+        self.rr = rr
+        self.rr_bots = rr_bots
+        self.rr_results = []
+        self.pending = 0  # Number of matches submitted to the pool that haven't finished yet
+
+
+def _run_league_play(working_dir: WorkingDir, run_strategy: RunStrategy, team_size: int, shutdowntime: int,
+                     stale_rematch_threshold: int, half_robin: bool, pool: MatchPool, pacer: Pacer):
+
     bots = load_all_bots_versioned(working_dir)
-    ladder = Ladder.read(working_dir.ladder)
+    with phase('result io'):
+        ladder = Ladder.read(working_dir.ladder)
+    seed = event_seed(ladder.bots)
 
-    latest_bots = [bot for bot in bots.values() if bot.bot_config.name in ladder.bots]
+    latest_bots = [bot for bot in bots.values() if bot.bot_config.name in ladder]
     latest_bots.sort(key=lambda b: b.updated_date, reverse=True)
     print('Most recently updated bots:')
     for bot in latest_bots:
@@ -73,95 +203,123 @@ def run_league_play(working_dir: WorkingDir, run_strategy: RunStrategy, replay_p
     # We need the result of every match to create the next ladder. For each match in each round robin, if a result
     # exist already, it will be parsed, if it doesn't exist, it will be played.
     # When all results have been found, the new ladder can be completed and saved.
-    new_ladder = Ladder(ladder.bots)
+    new_ladder = Ladder(ladder.bots.copy())
     event_results = []
 
-    # playing_division_indices contains either even or odd indices.
-    # If there is only one division always play that division (division 0, quantum).
-    playing_division_indices = ladder.playing_division_indices(run_strategy)
-
-    # The divisions play in reverse order, so quantum/overclocked division plays last
-    for div_index in playing_division_indices[::-1]:
-        print(f'Starting round robin for the {Ladder.DIVISION_NAMES[div_index]} division')
+    # The round robins play in reverse division order, so quantum/overclocked division plays last. A round robin that
+    # shares ladder slots with an earlier one plays with the bots the earlier one placed there, so it has to wait for
+    # it. Round robins without shared slots are started together so their matches can be played concurrently.
+    scheduler = DivisionScheduler(build_round_robin_graph(ladder, run_strategy, half_robin))
+    active_round_robins = {}  # Maps index of round robin to its RoundRobinState
+    job_round_robins = {}  # Maps id of submitted job to the index of its round robin
+    started_divisions = set()
+
+    def on_match_start(job: MatchJob):
+        # Let overlay know which match we are about to start
+        rr_index = job_round_robins.get(id(job))
+        if rr_index is None or rr_index not in active_round_robins:
+            # A late notice about a match that has already finished, e.g. a lease that expired and was reassigned
+            return
+        state = active_round_robins[rr_index]
+        with phase('overlay'):
+            overlay_data = OverlayData(job.div_index, job.blue, job.orange, new_ladder, bots, None,
+                                       state.rr_bots, state.rr_results)
+            overlay_data.write(working_dir.overlay_interface)
 
-        round_robin_ranges = get_round_robin_ranges(ladder, div_index, half_robin)
+    while not scheduler.is_done():
+        for rr in scheduler.take_ready():
+            if rr.div_index not in started_divisions:
+                started_divisions.add(rr.div_index)
+                print(f'Starting round robin for the {division_name(rr.div_index)} division')
 
-        for start_index, end_index in round_robin_ranges:
-            rr_bots = ladder.bots[start_index:end_index + 1]
-            rr_matches = generate_round_robin_matches(rr_bots)
-            rr_results = []
+            state = RoundRobinState(rr, new_ladder.bots[rr.start_index:rr.end_index + 1])
+            active_round_robins[rr.index] = state
 
-            for match_participants in rr_matches:
+            for match_participants in generate_round_robin_matches(state.rr_bots):
 
                 # Check if match has already been played during THIS session. Maybe something crashed and we had to
                 # restart autoleague, but we want to pick up where we left off.
-                session_result_path = working_dir.get_match_result(div_index, match_participants[0], match_participants[1])
+                session_result_path = working_dir.get_match_result(rr.div_index, match_participants[0], match_participants[1])
                 participant_1 = bots[match_participants[0]]
                 participant_2 = bots[match_participants[1]]
 
-                if session_result_path.exists():
+                with phase('result io'):
+                    session_result = MatchResult.read(session_result_path) if session_result_path.exists() else None
+                if session_result is not None:
                     print(f'Found existing result {session_result_path.name}')
-                    rr_results.append(MatchResult.read(session_result_path))
+                    state.rr_results.append(session_result)
                 else:
-                    historical_result = get_stale_match_result(participant_1, participant_2, stale_rematch_threshold,
-                                                               working_dir, True)
+                    with phase('result io'):
+                        historical_result = get_stale_match_result(participant_1, participant_2,
+                                                                   stale_rematch_threshold, working_dir, True)
                     if historical_result is not None:
-                        rr_results.append(historical_result)
+                        state.rr_results.append(historical_result)
                         # Don't write to result files at all, since this match didn't actually occur.
-                        overlay_data = OverlayData(div_index, participant_1, participant_2, new_ladder, bots,
-                                                   historical_result, rr_bots, rr_results)
-                        overlay_data.write(working_dir.overlay_interface)
-                        time.sleep(8)  # Show the overlay for a while. Not needed for any other reason.
+                        with phase('overlay'):
+                            overlay_data = OverlayData(rr.div_index, participant_1, participant_2, new_ladder, bots,
+                                                       historical_result, state.rr_bots, state.rr_results)
+                            overlay_data.write(working_dir.overlay_interface)
+                        pacer.dwell(8)  # Show the overlay for a while. Not needed for any other reason.
 
                     else:
-                        # Let overlay know which match we are about to start
-                        overlay_data = OverlayData(div_index, participant_1, participant_2, new_ladder, bots, None,
-                                                   rr_bots, rr_results)
-
-                        overlay_data.write(working_dir.overlay_interface)
-
-                        match_config = make_match_config(participant_1.bot_config, participant_2.bot_config, team_size)
-                        result = run_match(participant_1.bot_config.name, participant_2.bot_config.name, match_config,
-                                           replay_preference)
-                        result.write(session_result_path)
-                        versioned_result_path = working_dir.get_version_specific_match_result(participant_1,
-                                                                                              participant_2)
-                        result.write(versioned_result_path)
-                        print(f'Match finished {result.blue_goals}-{result.orange_goals}. Saved result as '
-                              f'{session_result_path} and also {versioned_result_path}')
-
-                        rr_results.append(result)
-
-                        # Let the winner celebrate and the scoreboard show for a few seconds.
-                        # This sleep not required.
-                        time.sleep(8)
+                        job = MatchJob(rr.div_index, participant_1, participant_2, team_size)
+                        job_round_robins[id(job)] = rr.index
+                        state.pending += 1
+                        pool.submit(job)
+
+        # Finish round robins that have all their results. This can unlock round robins that depend on them.
+        finished = [state for state in active_round_robins.values() if state.pending == 0]
+        if len(finished) == 0:
+            job, result = pool.next_result(on_match_start)
+            state = active_round_robins[job_round_robins.pop(id(job))]
+
+            session_result_path = working_dir.get_match_result(job.div_index, job.blue.bot_config.name,
+                                                               job.orange.bot_config.name)
+            with phase('result io'):
+                result.write(session_result_path)
+                versioned_result_path = working_dir.get_version_specific_match_result(job.blue, job.orange)
+                working_dir.write_version_specific_match_result(result, versioned_result_path)
+            print(f'Match finished {result.blue_goals}-{result.orange_goals}. Saved result as '
+                  f'{session_result_path} and also {versioned_result_path}')
+
+            state.rr_results.append(result)
+            state.pending -= 1
+            continue
+
+        for state in finished:
+            rr = state.rr
+            del active_round_robins[rr.index]
 
             # Find bots' overall score for the round robin
-            overall_scores = [CombinedScore.calc_score(bot, rr_results) for bot in rr_bots]
-            sorted_overall_scores = sorted(overall_scores)[::-1]
-            division_result_message = f'Bots\' overall round-robin performance ({Ladder.DIVISION_NAMES[div_index]} division):\n'
+            with phase('scoring'):
+                sorted_overall_scores = calc_scores(state.rr_bots, state.rr_results, seed)
+            division_result_message = f'Bots\' overall round-robin performance ({division_name(rr.div_index)} division):\n'
             for score in sorted_overall_scores:
                 division_result_message += f'> {score.bot:<32}: wins={score.wins:>2}, goal_diff={score.goal_diff:>3}\n'
 
             print(division_result_message)
-            overlay_data = OverlayData(div_index, None, None, new_ladder, bots, None, rr_bots, rr_results,
-                                       division_result_message)
-            overlay_data.write(working_dir.overlay_interface)
+            with phase('overlay'):
+                overlay_data = OverlayData(rr.div_index, None, None, new_ladder, bots, None, state.rr_bots,
+                                           state.rr_results, division_result_message)
+                overlay_data.write(working_dir.overlay_interface)
 
             # Rearrange bots in division on the new ladder
-            first_bot_index = start_index
-            bots_to_rearrange = len(rr_bots)
+            first_bot_index = rr.start_index
+            bots_to_rearrange = len(state.rr_bots)
             for i in range(bots_to_rearrange):
-                new_ladder.bots[first_bot_index + i] = sorted_overall_scores[i].bot
+                new_ladder.set_bot(first_bot_index + i, sorted_overall_scores[i].bot)
 
-            event_results.append(rr_results)
+            event_results.append(state.rr_results)
+            scheduler.finish(rr)
 
-            time.sleep(8)  # Show the division overlay for a while.
+            pacer.dwell(8)  # Show the division overlay for a while.
 
-        print(f'{Ladder.DIVISION_NAMES[div_index]} division done')
+            if scheduler.is_division_done(rr.div_index):
+                print(f'{division_name(rr.div_index)} division done')
 
     # Save new ladder
-    Ladder.write(new_ladder, working_dir.new_ladder)
+    with phase('result io'):
+        Ladder.write(new_ladder, working_dir.new_ladder)
     print(f'Done. Saved new ladder as {working_dir.new_ladder.name}')
     if shutdowntime != 0:
         import subprocess
@@ -172,54 +330,3 @@ def run_league_play(working_dir: WorkingDir, run_strategy: RunStrategy, replay_p
         working_dir.overlay_interface.unlink()
 
     return new_ladder
-
-
-def get_round_robin_ranges(ladder, div_index, half_robin):
-    """
-    Returns a list of tuples. Each tuple has the start index and the end index (inclusive) of some ladder slots
-    that should participate in a round robin. For example, it might return [(4, 2), (2, 0)], which means there
-    should be a round robin including slots 4, 3, 2, and another round robin including slots 2, 1, 0.
-    :param ladder: The ladder we're playing in.
-    :param div_index: The index of the division that is currently being played.
-    :param half_robin: True if we want to split this division into two round-robins so fewer matches need to be played.
-    """
-
-    if half_robin:
-        num_bots = ladder.division_size + ladder.overlap_size
-
-        # smaller indices = higher bots on the ladder
-        upper_range = (div_index * ladder.division_size, div_index * ladder.division_size + num_bots // 2)
-        lower_range = (div_index * ladder.division_size + num_bots // 2, (div_index + 1) * ladder.division_size)
-        sub_ranges = [lower_range, upper_range]
-    else:
-        sub_ranges = [(div_index * ladder.division_size, (div_index + 1) * ladder.division_size)]
-    return sub_ranges
-
-
-def find_historical_result(bot1: VersionedBot, bot2: VersionedBot, session_result_path: Path,
-                           stale_rematch_threshold: int, working_dir: WorkingDir):
-    if session_result_path.exists():
-        # Found existing result
-        try:
-            print(f'Found existing result {session_result_path.name}')
-            return MatchResult.read(session_result_path)
-
-        except Exception as e:
-            print(f'Error loading result {session_result_path.name}. Fix/delete the result and run script again.')
-            raise e
-
-    return get_stale_match_result(bot1, bot2, stale_rematch_threshold, working_dir, True)
-
-
-def get_stale_match_result(bot1: VersionedBot, bot2: VersionedBot, stale_rematch_threshold: int,
-                           working_dir: WorkingDir, print_debug: bool = False):
-    if stale_rematch_threshold > 0:
-        match_history = MatchHistory(working_dir.get_version_specific_match_files(bot1.get_key(), bot2.get_key()))
-        if not match_history.is_empty():
-            streak = match_history.get_current_streak_length()
-            if streak >= stale_rematch_threshold:
-                if print_debug:
-                    print(f'Found stale rematch between {bot1.bot_config.name} and {bot2.bot_config.name}. '
-                          f'{match_history.get_latest_result().winner} has won {streak} times in a row.')
-                return match_history.get_latest_result()
-    return None
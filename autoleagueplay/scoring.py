@@ -0,0 +1,59 @@
+"""
+Calculates the combined scores of all bots in a round robin in a single pass over the results.
+"""
+import zlib
+from typing import List, Union
+
+from autoleagueplay.match_result import CombinedScore, MatchResult, tie_break_key
+from autoleagueplay.result_table import BLUE_GOALS, BLUE_POINTS, BLUE_SAVES, BLUE_SHOTS, ORANGE_GOALS, ResultTable
+
+# Columns of the score table, in the order CombinedScore compares them
+WINS, GOAL_DIFF, GOALS, SHOTS, SAVES, POINTS = range(6)
+
+
+def event_seed(ladder_bots: List[str]) -> int:
+    """
+    Returns the tie break seed of the league play event that starts from the given ladder. Ties are then broken the
+    same way every time the event's scores are calculated, but differently from week to week.
+    """
+    return zlib.crc32('\n'.join(ladder_bots).encode('utf-8'))
+
+
+def calc_scores(bots: List[str], match_results: Union[ResultTable, List[MatchResult]],
+                seed: int) -> List[CombinedScore]:
+    """
+    Returns the combined score of each of the given bots based on the given results, sorted with the best bot first.
+    Results involving other bots are ignored. Bots that performed equally well are ordered by a coin flip decided by
+    the seed, so the order is the same every time. Use event_seed for the seed of a league play event.
+    """
+    import numpy as np
+    table = match_results if isinstance(match_results, ResultTable) else ResultTable.from_results(match_results)
+    positions = table.bot_ids(bots)
+    blue = positions[table.blue]
+    orange = positions[table.orange]
+    stats = table.stats.astype(np.int64)
+
+    scores = np.zeros((len(bots), 6), dtype=np.int64)
+    for own, opponent, offset in ((blue, orange, 0), (orange, blue, 1)):
+        goals = stats[:, BLUE_GOALS + offset]
+        conceded = stats[:, ORANGE_GOALS - offset]
+        side_scores = np.stack([
+            goals > conceded,
+            goals - conceded,
+            goals,
+            stats[:, BLUE_SHOTS + offset],
+            stats[:, BLUE_SAVES + offset],
+            stats[:, BLUE_POINTS + offset],
+        ], axis=1)
+        # A bot playing itself only counts as blue, like CombinedScore.calc_score does
+        rows = own >= 0 if offset == 0 else (own >= 0) & (own != opponent)
+        np.add.at(scores, own[rows], side_scores[rows])
+
+    # lexsort uses the last key as the primary key, so the keys are given from least to most significant
+    tie_breaks = np.array([tie_break_key(bot, seed) for bot in bots], dtype=np.int64)
+    order = np.lexsort((np.array(bots, dtype=str), tie_breaks) + tuple(scores[:, col] for col in range(POINTS, -1, -1)))
+
+    return [
+        CombinedScore(bots[i], *(int(value) for value in scores[i]), seed=seed)
+        for i in order[::-1]
+    ]
@@ -0,0 +1,153 @@
+"""
+A match backend that plays matches in memory instead of in Rocket League. It generates a stream of synthetic
+GameTickPackets for each match and runs them through the exercise's grader, exactly like the packets from the game,
+so everything but the game itself is exercised. The outcome of the matches is decided by a SimulationModel.
+"""
+import random
+from typing import Dict, Iterator, Optional, Set
+
+from rlbot.training.training import Result
+from rlbot.utils.structures.game_data_struct import GameTickPacket
+from rlbottraining.grading.training_tick_packet import TrainingTickPacket
+
+from autoleagueplay.match_backend import MatchBackend
+from autoleagueplay.match_exercise import MatchExercise
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.replays import ReplayPreference
+
+REPLAY_TICKS = 3  # Ticks without an active round after each goal, like the goal replay in the game
+WINNER_SCREEN_TICKS = 30  # Ticks after the match has ended. Graders must have decided by then
+
+
+class SimulationModel:
+    """
+    Decides how well each bot plays. Every bot has a strength, and in each second of a match a goal is scored with a
+    probability based on goals_per_match. The goal goes to a team with a probability proportional to its strength.
+    Bots without a given strength get a random one, which is the same every time for the same bot name and seed.
+    :param strengths: Strength of some or all bots. Must be positive.
+    :param goals_per_match: The average number of goals in a match.
+    :param match_seconds: The length of a match before overtime.
+    :param broken_bots: Bots that never move, e.g. to simulate bots that fail to start.
+    """
+
+    def __init__(self, strengths: Optional[Dict[str, float]] = None, goals_per_match: float = 6.0,
+                 match_seconds: int = 300, broken_bots: Set[str] = frozenset(), seed: int = 0):
+        self.strengths = dict(strengths or {})
+        self.goals_per_match = goals_per_match
+        self.match_seconds = match_seconds
+        self.broken_bots = broken_bots
+        self.seed = seed
+
+    def strength(self, bot: str) -> float:
+        if bot not in self.strengths:
+            self.strengths[bot] = random.Random(f'{self.seed}:{bot}').lognormvariate(0, 0.5)
+        return self.strengths[bot]
+
+
+def simulate_match(match_config, model: SimulationModel, rng: random.Random) -> Iterator[GameTickPacket]:
+    """
+    Yields one packet per second of game time until the match has ended. The same packet object is updated and
+    yielded every time.
+    """
+    packet = GameTickPacket()
+    players = match_config.player_configs
+    packet.num_cars = len(players)
+    packet.num_teams = 2
+    for i, player in enumerate(players):
+        car = packet.game_cars[i]
+        car.name = player.name
+        car.team = player.team
+        car.is_bot = True
+    packet.teams[0].team_index = 0
+    packet.teams[1].team_index = 1
+
+    team_strengths = [sum(model.strength(p.name) for p in players if p.team == team) for team in (0, 1)]
+    blue_share = team_strengths[0] / (team_strengths[0] + team_strengths[1])
+    goal_chance = model.goals_per_match / model.match_seconds
+
+    info = packet.game_info
+    info.game_time_remaining = model.match_seconds
+    info.game_speed = 1.0
+
+    def tick(seconds: float, round_active: bool, kickoff: bool = False):
+        info.seconds_elapsed += seconds
+        info.frame_num += int(seconds * 120)
+        info.is_round_active = round_active
+        info.is_kickoff_pause = kickoff
+        if round_active:
+            for i, player in enumerate(players):
+                if player.name not in model.broken_bots:
+                    packet.game_cars[i].physics.location.y = rng.uniform(-5000, 5000)
+
+    # Kickoff, then one packet per second of play
+    tick(0, True, kickoff=True)
+    yield packet
+    while True:
+        tick(1, True)
+        if info.is_overtime:
+            info.game_time_remaining += 1
+        else:
+            info.game_time_remaining = max(0.0, info.game_time_remaining - 1)
+
+        if rng.random() < goal_chance:
+            team = 0 if rng.random() < blue_share else 1
+            packet.teams[team].score += 1
+            scorer = packet.game_cars[[i for i, p in enumerate(players) if p.team == team][0]]
+            scorer.score_info.goals += 1
+            scorer.score_info.shots += 1
+            scorer.score_info.score += 100
+            yield packet
+
+            if info.is_overtime:
+                break
+            for _ in range(REPLAY_TICKS):
+                tick(1, False)
+                yield packet
+            tick(0, True, kickoff=True)
+        elif rng.random() < goal_chance:
+            # A shot that didn't go in
+            team = rng.randrange(2)
+            shooter = packet.game_cars[[i for i, p in enumerate(players) if p.team == team][0]]
+            keeper = packet.game_cars[[i for i, p in enumerate(players) if p.team != team][0]]
+            shooter.score_info.shots += 1
+            shooter.score_info.score += 20
+            keeper.score_info.saves += 1
+            keeper.score_info.score += 50
+        yield packet
+
+        if info.game_time_remaining <= 0 and not info.is_overtime:
+            if packet.teams[0].score != packet.teams[1].score:
+                break
+            info.is_overtime = True
+
+    # The winner screen
+    info.is_match_ended = True
+    for _ in range(WINNER_SCREEN_TICKS):
+        tick(1, False)
+        yield packet
+
+
+class SimulatedBackend(MatchBackend):
+    """
+    Plays matches by running synthetic packets through the exercise's grader. Replays are never saved.
+    """
+
+    headless = True
+
+    def __init__(self, model: Optional[SimulationModel] = None, seed: int = 0):
+        self.model = model or SimulationModel(seed=seed)
+        self.rng = random.Random(seed)
+
+    def run_match(self, participant_1: str, participant_2: str, match_config,
+                  replay_preference: ReplayPreference) -> MatchResult:
+        return super().run_match(participant_1, participant_2, match_config, ReplayPreference.IGNORE_REPLAY)
+
+    def run_exercise(self, exercise: MatchExercise) -> Result:
+        grader = exercise.grader
+        tick = TrainingTickPacket()
+        for packet in simulate_match(exercise.match_config, self.model, self.rng):
+            tick.game_tick_packet = packet
+            grade = grader.on_tick(tick)
+            if grade is not None:
+                return Result(exercise, 0, grade)
+        raise Exception(f'The grader never decided the outcome of {exercise.name}')
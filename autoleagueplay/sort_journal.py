@@ -0,0 +1,107 @@
+"""
+An append-only journal of the swaps made while sorting the ladder. Appending a line per swap is cheap, while
+rewriting ladder.txt costs time proportional to the size of the ladder, so the ladder file is only rewritten at
+checkpoints. If the sort is interrupted before a checkpoint, the swaps in the journal are replayed onto ladder.txt
+the next time a sort starts.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from autoleagueplay.ladder import Ladder
+
+
+class SortJournal:
+    """
+    Journal of the swaps made on a ladder since ladder.txt was last written. Usage:
+    >>> journal = SortJournal(working_dir.sort_journal, working_dir.ladder)
+    >>> ladder = journal.recover()
+    >>> ladder.swap(bot1, bot2)
+    >>> journal.record_swap(ladder, bot1, bot2)
+    >>> journal.checkpoint(ladder)
+    """
+
+    def __init__(self, path: Path, ladder_path: Path, checkpoint_interval: int = 100):
+        """
+        :param checkpoint_interval: The number of swaps after which the ladder file is rewritten.
+        """
+        self.path = path
+        self.ladder_path = ladder_path
+        self.checkpoint_interval = checkpoint_interval
+        self._file = None
+        self._swaps_since_checkpoint = 0
+
+    def recover(self) -> Ladder:
+        """
+        Reads the ladder file and replays the swaps of an interrupted sort onto it. If that changes the ladder, the
+        recovered ladder is written back to the ladder file. The journal is emptied either way. The ladder file is
+        left untouched when there is nothing to recover, e.g. so a git pull of the working directory isn't blocked.
+        """
+        ladder = Ladder.read(self.ladder_path)
+        if not self.path.exists():
+            return ladder
+
+        with open(self.path, 'r') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        # A checkpoint marker is written before the ladder file is replaced. If the ladder file already contains the
+        # marked ladder, the sort was interrupted after replacing it, and the swaps before the marker were applied.
+        for i in range(len(entries) - 1, -1, -1):
+            if 'checkpoint' in entries[i]:
+                if entries[i]['checkpoint'] == _ladder_hash(ladder):
+                    entries = entries[i + 1:]
+                break
+
+        original_bots = list(ladder.bots)
+        swaps = [entry['swap'] for entry in entries if 'swap' in entry]
+        for bot1, bot2 in swaps:
+            if bot1 in ladder and bot2 in ladder:
+                ladder.swap(bot1, bot2)
+        if len(swaps) > 0:
+            print(f'Recovered {len(swaps)} swaps from an interrupted sort')
+        if ladder.bots != original_bots:
+            self.checkpoint(ladder)
+        else:
+            self.path.unlink()
+        return ladder
+
+    def record_swap(self, ladder: Ladder, bot1: str, bot2: str):
+        """
+        Appends a swap that has been made on the ladder to the journal. The ladder file is rewritten when enough swaps
+        have been recorded since the last checkpoint.
+        """
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps({'swap': [bot1, bot2]}) + '\n')
+        self._file.flush()
+        self._swaps_since_checkpoint += 1
+        if self._swaps_since_checkpoint >= self.checkpoint_interval:
+            self.checkpoint(ladder)
+
+    def checkpoint(self, ladder: Ladder):
+        """
+        Writes the ladder to the ladder file atomically and empties the journal.
+        """
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps({'checkpoint': _ladder_hash(ladder)}) + '\n')
+        self._file.flush()
+
+        temp_path = self.ladder_path.with_name(self.ladder_path.name + '.tmp')
+        ladder.write(temp_path)
+        os.replace(str(temp_path), str(self.ladder_path))
+
+        self._file.close()
+        self._file = None
+        self.path.unlink()
+        self._swaps_since_checkpoint = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _ladder_hash(ladder: Ladder) -> str:
+    return hashlib.sha1('\n'.join(ladder.bots).encode('utf-8')).hexdigest()
@@ -0,0 +1,38 @@
+"""
+Finds results of earlier matches that can be reused instead of playing a match again.
+Kept separate from run_matches, so commands that only list matches don't have to import everything needed to play them.
+"""
+from pathlib import Path
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.versioned_bot import VersionedBot
+
+
+def find_historical_result(bot1: VersionedBot, bot2: VersionedBot, session_result_path: Path,
+                           stale_rematch_threshold: int, working_dir: WorkingDir):
+    if session_result_path.exists():
+        # Found existing result
+        try:
+            print(f'Found existing result {session_result_path.name}')
+            return MatchResult.read(session_result_path)
+
+        except Exception as e:
+            print(f'Error loading result {session_result_path.name}. Fix/delete the result and run script again.')
+            raise e
+
+    return get_stale_match_result(bot1, bot2, stale_rematch_threshold, working_dir, True)
+
+
+def get_stale_match_result(bot1: VersionedBot, bot2: VersionedBot, stale_rematch_threshold: int,
+                           working_dir: WorkingDir, print_debug: bool = False):
+    if stale_rematch_threshold > 0:
+        head_to_head = working_dir.get_head_to_head(bot1.get_key(), bot2.get_key())
+        if head_to_head is not None:
+            streak = head_to_head.streak
+            if streak >= stale_rematch_threshold:
+                if print_debug:
+                    print(f'Found stale rematch between {bot1.bot_config.name} and {bot2.bot_config.name}. '
+                          f'{head_to_head.latest_winner} has won {streak} times in a row.')
+                return head_to_head.latest_result
+    return None
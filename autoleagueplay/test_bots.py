@@ -3,13 +3,12 @@ from dataclasses import dataclass
 from typing import Optional
 
 from autoleagueplay.match_result import MatchResult
-from rlbot.setup_manager import setup_manager_context
-from rlbottraining.exercise_runner import run_playlist
 
 from autoleagueplay.load_bots import load_all_bots
+from autoleagueplay.match_backend import MatchBackend
 from autoleagueplay.match_exercise import MatchExercise
 
-from autoleagueplay.run_matches import make_match_config
+from autoleagueplay.run_matches import make_match_config, MatchSession
 
 from autoleagueplay.ladder import Ladder
 
@@ -46,8 +45,10 @@ class AliveGrader(Grader):
 
     def on_tick(self, tick: TrainingTickPacket) -> Optional[Grade]:
         packet = tick.game_tick_packet
+        # Game time rather than wall time, so simulated matches don't have to take as long as real ones
+        now = packet.game_info.seconds_elapsed
         if self.first_packet_time is None:
-            self.first_packet_time = time.time()
+            self.first_packet_time = now
             self.blue_first_loc_y = packet.game_cars[0].physics.location.y
             self.orange_first_loc_y = packet.game_cars[1].physics.location.y
         else:
@@ -58,11 +59,11 @@ class AliveGrader(Grader):
             self.orange_moved = self.orange_moved or abs(self.orange_first_loc_y - orange_new_loc_y) > 5
 
         # Both bots have moved!
-        if time.time() - self.first_packet_time > self.test_min_time and self.blue_moved and self.orange_moved:
+        if now - self.first_packet_time > self.test_min_time and self.blue_moved and self.orange_moved:
             return Pass()
 
         # Check if time is up. If so fail test
-        if time.time() - self.first_packet_time > self.test_total_time:
+        if now - self.first_packet_time > self.test_total_time:
             if not self.blue_moved and not self.orange_moved:
                 return FailDueToNoMovement(packet.game_cars[0].name, packet.game_cars[1].name)
             if not self.blue_moved:
@@ -73,7 +74,8 @@ class AliveGrader(Grader):
         return None
 
 
-def run_test_match(participant_1: str, participant_2: str, match_config) -> Optional[Grade]:
+def run_test_match(participant_1: str, participant_2: str, match_config,
+                   backend: Optional[MatchBackend] = None) -> Optional[Grade]:
 
     # Play the match
     print(f'Starting test match: {participant_1} vs {participant_2}...')
@@ -83,18 +85,13 @@ def run_test_match(participant_1: str, participant_2: str, match_config) -> Opti
         grader=AliveGrader()
     )
 
-    with setup_manager_context() as setup_manager:
+    if backend is not None:
+        return backend.run_exercise(match).grade
+    with MatchSession() as session:
+        return session.run_exercise(match).grade
 
-        # If any bots have signed up for early start, give them 10 seconds.
-        # This is typically enough for Scratch.
-        setup_manager.early_start_seconds = 10
 
-        # For loop, but should only run exactly once
-        for exercise_result in run_playlist([match], setup_manager=setup_manager):
-            return exercise_result.grade
-
-
-def test_all_bots(working_dir: WorkingDir):
+def test_all_bots(working_dir: WorkingDir, backend: Optional[MatchBackend] = None):
     """
     Tests if all bots work by starting a series of matches and check if the bots move
     """
@@ -114,7 +111,7 @@ def test_all_bots(working_dir: WorkingDir):
         participant_1 = bots[match_participant_pair[0]]
         participant_2 = bots[match_participant_pair[1]]
         match_config = make_match_config(participant_1, participant_2)
-        grade = run_test_match(participant_1.name, participant_2.name, match_config)
+        grade = run_test_match(participant_1.name, participant_2.name, match_config, backend)
         if isinstance(grade, Fail):
             fails.append(grade)
         time.sleep(1)
@@ -0,0 +1,193 @@
+"""
+Measures how much time autoleagueplay spends in each phase of its work, e.g. loading bots, playing a match or waiting
+for a replay. Phases are timed with the module level timer:
+>>> with phase('result io'):
+...     result.write(path)
+
+Phases can be nested, and attributes given to a phase, like the name of the match, are inherited by the phases
+inside it. When a trace file is open, every finished phase is also appended to it as one line of json, e.g.
+{"run": "2020-01-01T20:00:00", "name": "replay wait", "start": 1577905200.0, "seconds": 2.5, "thread": "match-worker-0",
+ "parent": "match", "match": "Bot A vs Bot B"}
+"""
+import bisect
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+MATCH_PHASE = 'match'
+
+TICK_BUDGET = 1 / 120  # Seconds. The game sends 120 packets per second, so grading a tick must take less than this.
+TICK_HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)  # Upper bounds of the histogram's buckets
+
+
+class PhaseTimer:
+    """
+    Sums up the time spent in each named phase, in total and per match. Phases can be timed from several threads at
+    once, in which case their time is counted once per thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Stack of the phases the current thread is in
+        self.totals = defaultdict(float)  # Seconds spent in each phase
+        self.counts = defaultdict(int)  # Number of times each phase was entered
+        self.match_totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._trace_file = None
+        self._run_id = None
+
+    @contextmanager
+    def phase(self, name: str, **attrs):
+        stack = self._stack()
+        context = dict(stack[-1][1]) if len(stack) > 0 else {}
+        context.update(attrs)
+        stack.append((name, context))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self._add(name, time.perf_counter() - start, context)
+
+    def record(self, name: str, since: float, **attrs):
+        """
+        Records a phase that started at the given time.perf_counter() timestamp and ends now. Useful for phases that
+        don't fit in a with statement, e.g. because they are detected tick by tick.
+        """
+        stack = self._stack()
+        context = dict(stack[-1][1]) if len(stack) > 0 else {}
+        context.update(attrs)
+        self._add(name, time.perf_counter() - since, context)
+
+    def start_trace(self, path: Path):
+        """
+        Appends all phases that finish from now on to the given json lines file.
+        """
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+            self._trace_file = open(path, 'a', buffering=1)  # Line buffered, so a crash loses at most one line
+            self._run_id = datetime.now().isoformat(timespec='seconds')
+
+    def stop_trace(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+            self.counts.clear()
+            self.match_totals.clear()
+
+    def summary(self, total: Optional[float] = None) -> str:
+        """
+        Returns a table with the time spent in each phase, slowest first. If the total time is given, each phase's
+        share of it is included. Nested phases are included in the time of their parents too.
+        """
+        with self._lock:
+            rows = sorted(self.totals.items(), key=lambda item: item[1], reverse=True)
+            counts = dict(self.counts)
+
+        lines = [f'{"Phase":<16} {"Count":>8} {"Seconds":>10} {"Share":>7}']
+        for name, seconds in rows:
+            share = f'{100 * seconds / total:>6.1f}%' if total else ''
+            lines.append(f'{name:<16} {counts[name]:>8} {seconds:>10.3f} {share:>7}')
+        if total is not None:
+            lines.append(f'{"total":<16} {"":>8} {total:>10.3f}')
+        return '\n'.join(lines)
+
+    def match_summary(self) -> str:
+        """
+        Returns a table with the time spent in each phase of each match, in the order the matches finished.
+        """
+        with self._lock:
+            matches = {match: dict(phases) for match, phases in self.match_totals.items()}
+        if len(matches) == 0:
+            return 'No matches were played'
+
+        columns = []
+        for phases in matches.values():
+            columns += [name for name in phases if name not in columns and name != MATCH_PHASE]
+        width = max(len(match) for match in matches)
+
+        lines = [f'{"Match":<{width}} ' + ' '.join(f'{name:>12}' for name in columns + ['total'])]
+        for match, phases in matches.items():
+            values = [phases.get(name, 0.0) for name in columns] + [phases.get(MATCH_PHASE, 0.0)]
+            lines.append(f'{match:<{width}} ' + ' '.join(f'{seconds:>12.3f}' for seconds in values))
+        return '\n'.join(lines)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _add(self, name: str, seconds: float, context: Dict[str, Any]):
+        stack = self._stack()
+        with self._lock:
+            self.totals[name] += seconds
+            self.counts[name] += 1
+            if MATCH_PHASE in context:
+                self.match_totals[context[MATCH_PHASE]][name] += seconds
+
+            if self._trace_file is not None:
+                span = {
+                    'run': self._run_id,
+                    'name': name,
+                    'start': round(time.time() - seconds, 3),
+                    'seconds': round(seconds, 6),
+                    'thread': threading.current_thread().name,
+                }
+                if len(stack) > 0:
+                    span['parent'] = stack[-1][0]
+                span.update(context)
+                self._trace_file.write(json.dumps(span) + '\n')
+
+
+class TickStats:
+    """
+    A histogram of how long each tick of a match took to handle, along with the slowest tick and the number of ticks
+    that took longer than the budget.
+    """
+
+    def __init__(self, budget: float = TICK_BUDGET):
+        self.budget = budget
+        self.ticks = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.over_budget = 0
+        self.histogram = [0] * (len(TICK_HISTOGRAM_BOUNDS_MS) + 1)  # The last bucket has no upper bound
+
+    def add(self, seconds: float):
+        self.ticks += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if seconds > self.budget:
+            self.over_budget += 1
+        self.histogram[bisect.bisect_left(TICK_HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def to_json(self) -> Dict[str, Any]:
+        bucket_names = [f'{bound}ms' for bound in TICK_HISTOGRAM_BOUNDS_MS] + ['inf']
+        return {
+            'ticks': self.ticks,
+            'mean_ms': round(1000 * self.total / self.ticks, 4) if self.ticks > 0 else 0.0,
+            'max_ms': round(1000 * self.max, 4),
+            'budget_ms': round(1000 * self.budget, 4),
+            'over_budget': self.over_budget,
+            'histogram': dict(zip(bucket_names, self.histogram)),
+        }
+
+
+timer = PhaseTimer()
+
+
+def phase(name: str, **attrs):
+    """
+    Times the phase with the given name using the module level timer.
+    """
+    return timer.phase(name, **attrs)
@@ -1,10 +1,13 @@
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-from rlbot.parsing.bot_config_bundle import BotConfigBundle
+if TYPE_CHECKING:
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
 
 
 class VersionedBot:
-    def __init__(self, bot_config: BotConfigBundle, updated_date: datetime):
+    def __init__(self, bot_config: 'BotConfigBundle', updated_date: datetime):
+        # The annotation is a string, so commands that don't parse bot configs don't have to import rlbot
         self.updated_date = updated_date
         self.bot_config = bot_config
 